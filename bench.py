@@ -0,0 +1,502 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# ####################################################################
+# specker-lib - spec file manipulation library
+# Copyright (C) 2015  Fridolin Pokorny, fpokorny@redhat.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ####################################################################
+'''
+Library benchmark tool
+@author: Fridolin Pokorny
+@contact: fpokorny@redhat.com
+@organization: Red Hat Inc.
+@license: GPL 2.0
+'''
+
+import gc
+import copy
+import os
+import sys
+import time
+import shutil
+import tempfile
+import multiprocessing
+import logging
+import optparse
+import cStringIO
+from modules.specDefaultEditor import SpecDefaultEditor
+from modules.specFile import SpecFile
+from modules.specFileParser import SpecFileParser
+from modules.specFileRenderer import SpecFileRenderer
+from modules.specModelReader import SpecModelReader
+from modules.specModelWriter import SpecModelWriter
+from modules.specPool import SpecPool
+from modules.specSection import SpecStDefinition, SpecStPackage, SpecStPrep, SpecStDescription
+from modules.specToken import SpecToken
+from modules.specTokenList import SpecTokenList
+from modules.specTokenizer import SpecCharTokenizer, SpecRegexTokenizer
+
+LOGGER = logging.getLogger('specker-bench')
+
+def timeit(func, rounds):
+	'''
+	Measure the best wall time of a function
+	@param func: function to be measured
+	@type func: func() -> any
+	@param rounds: number of measurements
+	@type rounds: number
+	@return: best time in seconds and the last result of func
+	@rtype: tuple (number, any)
+	'''
+	best = None
+	for _ in xrange(rounds):
+		start = time.time()
+		ret = func()
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best, ret
+
+def token_tuple(token):
+	'''
+	Get comparable representation of a token
+	@param token: token to be converted
+	@type token: L{SpecToken}
+	@return: all token attributes
+	@rtype: tuple
+	'''
+	return (token.prepend, token.token, token.append, token.line,
+				token.eol_count_prepend, token.eol_count_append)
+
+def bench_tokenizer(content, rounds):
+	'''
+	Compare tokenizer backends
+	@param content: spec file content to be tokenized
+	@type content: string
+	@param rounds: number of measurements
+	@type rounds: number
+	@return: None
+	@rtype: None
+	'''
+	results = []
+	for tokenizer in [ SpecCharTokenizer, SpecRegexTokenizer ]:
+		t, tokens = timeit(lambda: list(tokenizer.tokenize(SpecFile(content))), rounds)
+		LOGGER.info("%-20s %8d tokens %10.4fs %12.0f tokens/sec"
+				% (tokenizer.__name__, len(tokens), t, len(tokens) / t))
+		results.append([token_tuple(x) for x in tokens])
+
+	if results[0] != results[1]:
+		LOGGER.error("Error: tokenizers produced different token streams")
+		sys.exit(1)
+
+def bench_token_memory(content, rounds):
+	'''
+	Report memory held by tokens compared to tokens owning their strings
+	@param content: spec file content to be tokenized
+	@type content: string
+	@param rounds: number of measurements, unused
+	@type rounds: number
+	@return: None
+	@rtype: None
+	'''
+	tokens = list(SpecRegexTokenizer.tokenize(SpecFile(content)))
+
+	class OwnedToken:
+		# token layout before offsets were introduced
+		def __init__(self, t):
+			self.prepend, self.token, self.append = t.prepend, t.token, t.append
+			self.eol_count_prepend, self.eol_count_append = t.eol_count_prepend, t.eol_count_append
+			self.line = t.line
+
+	size = sum(sys.getsizeof(t) for t in tokens)
+	# offsets and lines above the small int cache are held as separate objects
+	size += sum(sys.getsizeof(t.start) + sys.getsizeof(t.line) for t in tokens)
+
+	size_strings = 0
+	for t in tokens:
+		o = OwnedToken(t)
+		size_strings += sys.getsizeof(o) + sys.getsizeof(o.__dict__) + sys.getsizeof(o.line) \
+				+ sys.getsizeof(o.prepend) + sys.getsizeof(o.token) + sys.getsizeof(o.append)
+
+	LOGGER.info("%-20s %8d tokens %10d bytes %8.1f bytes/token"
+			% ('offsets', len(tokens), size, float(size) / len(tokens)))
+	LOGGER.info("%-20s %8d tokens %10d bytes %8.1f bytes/token"
+			% ('owned strings', len(tokens), size_strings, float(size_strings) / len(tokens)))
+
+def parse(content, columnar = True):
+	'''
+	Parse a spec file
+	@param content: spec file content to be parsed
+	@type content: string
+	@param columnar: use columnar token list
+	@type columnar: Boolean
+	@return: parsed model
+	@rtype: L{SpecModel}
+	'''
+	parser = SpecFileParser(SpecModelWriter())
+	parser.token_list = SpecTokenList(content, columnar = columnar)
+	parser.parse()
+	return parser.get_model_writer().get_model()
+
+def render(model):
+	'''
+	Render a model
+	@param model: model to be rendered
+	@type model: L{SpecModel}
+	@return: rendered spec file
+	@rtype: string
+	'''
+	output = cStringIO.StringIO()
+	SpecFileRenderer(SpecModelReader(model)).render(output)
+	return output.getvalue()
+
+def bench_parse(content, rounds):
+	'''
+	Measure parsing and rendering using list and columnar token lists
+	@param content: spec file content to be parsed
+	@type content: string
+	@param rounds: number of measurements
+	@type rounds: number
+	@return: None
+	@rtype: None
+	'''
+	for columnar in [ False, True ]:
+		model = None
+		gc.collect()
+		t_parse, model = timeit(lambda: parse(content, columnar), rounds)
+		t_render, output = timeit(lambda: render(model), rounds)
+		gc.collect()
+		tokens = len([ x for x in gc.get_objects() if isinstance(x, SpecToken) ])
+		LOGGER.info("%-20s parse %8.4fs render %8.4fs %8d token objects alive"
+				% ('columnar' if columnar else 'list', t_parse, t_render, tokens))
+
+		if output != content:
+			LOGGER.error("Error: rendered output differs from input")
+			sys.exit(1)
+
+def bench_lazy(content, rounds):
+	'''
+	Measure reading the first tokens of a spec file using lazy and eager lexing
+	@param content: spec file content to be tokenized
+	@type content: string
+	@param rounds: number of measurements
+	@type rounds: number
+	@return: None
+	@rtype: None
+	'''
+	def read_head(lazy):
+		token_list = SpecTokenList(content, lazy = lazy)
+		for _ in xrange(100):
+			token_list.get()
+		return token_list
+
+	for lazy in [ False, True ]:
+		t, token_list = timeit(lambda: read_head(lazy), rounds)
+		LOGGER.info("%-20s %8d tokens lexed %10.4fs"
+				% ('lazy' if lazy else 'eager', len(token_list.store), t))
+
+def bench_pool(content, rounds):
+	'''
+	Measure parsing and rendering of a corpus using a process pool with
+	increasing number of workers
+	@param content: spec file content used for each spec file of the corpus
+	@type content: string
+	@param rounds: number of measurements
+	@type rounds: number
+	@return: None
+	@rtype: None
+	'''
+	def process(workers):
+		pool = SpecPool(workers)
+		ret = [ output for _, output, _ in pool.process(paths) ]
+		pool.close()
+		return ret
+
+	cpus = multiprocessing.cpu_count()
+	corpus = tempfile.mkdtemp()
+	try:
+		paths = []
+		for i in xrange(4 * cpus):
+			paths.append(os.path.join(corpus, '%d.spec' % i))
+			with open(paths[-1], 'w') as f:
+				f.write(content)
+
+		serial = None
+		workers = 1
+		while True:
+			t, outputs = timeit(lambda: process(workers), rounds)
+			if serial is None:
+				serial = t
+			LOGGER.info("%-20s %8d spec files %10.4fs speedup %6.2f"
+					% ('%d workers' % workers, len(paths), t, serial / t))
+
+			if outputs != [ content ] * len(paths):
+				LOGGER.error("Error: rendered output differs from input")
+				sys.exit(1)
+
+			if workers >= cpus:
+				break
+			workers = min(workers * 2, cpus)
+	finally:
+		shutil.rmtree(corpus)
+
+def bench_edit(content, rounds):
+	'''
+	Measure removing all main package build requires and adding provides to
+	a subpackage with and without a batch
+	@param content: spec file content to be edited
+	@type content: string
+	@param rounds: number of measurements
+	@type rounds: number
+	@return: None
+	@rtype: None
+	'''
+	def edit(models, batch):
+		model = models.pop()
+		writer = SpecModelWriter(model)
+		editor = SpecDefaultEditor(SpecModelReader(model), writer)
+		provides = [ 'golang(example.com/pkg%d)' % i for i in xrange(300) ]
+
+		def run():
+			for d in model.find_definitions('BuildRequires:', [ None ]):
+				writer.remove_definition(d)
+			editor.provides_add({ 'devel': provides })
+
+		if batch:
+			with writer.batch():
+				run()
+		else:
+			run()
+		return model
+
+	outputs = []
+	for batch in [ False, True ]:
+		models = [ parse(content) for _ in xrange(rounds) ]
+		t, model = timeit(lambda: edit(models, batch), rounds)
+		outputs.append(render(model))
+		LOGGER.info("%-20s %8.4fs" % ('batch' if batch else 'single', t))
+
+	if outputs[0] != outputs[1]:
+		LOGGER.error("Error: rendered outputs differ")
+		sys.exit(1)
+
+def bench_fork(content, rounds):
+	'''
+	Measure getting a modifiable copy of a model by parsing, deep copying and
+	forking for growing spec files
+	@param content: spec file content to be copied
+	@type content: string
+	@param rounds: number of measurements
+	@type rounds: number
+	@return: None
+	@rtype: None
+	'''
+	def fork_edit(model):
+		fork = model.fork()
+		editor = SpecDefaultEditor(SpecModelReader(fork), SpecModelWriter(fork))
+		editor.provides_add({ 'devel': [ 'golang(example.com/pkg)' ] })
+		return fork
+
+	for multiply in [ 1, 2, 4 ]:
+		spec = content * multiply
+		model = parse(spec)
+		t_parse, _ = timeit(lambda: parse(spec), rounds)
+		t_deepcopy, _ = timeit(lambda: copy.deepcopy(model), rounds)
+		t_fork, _ = timeit(lambda: [ model.fork() for _ in xrange(1000) ], rounds)
+		t_edit, fork = timeit(lambda: fork_edit(model), rounds)
+		LOGGER.info("%-20s parse %8.4fs deepcopy %8.4fs fork %10.6fs fork+edit %8.4fs"
+				% ('%d sections' % len(model.get_sections()), t_parse, t_deepcopy,
+					t_fork / 1000, t_edit))
+
+		if render(model) != spec or render(fork) == spec:
+			LOGGER.error("Error: fork modification leaked to the forked model")
+			sys.exit(1)
+
+def bench_render(content, rounds):
+	'''
+	Measure rendering of a model with one added provides to a file, with and
+	without buffering output and writing unmodified sections from their
+	source text
+	@param content: spec file content to be rendered
+	@type content: string
+	@param rounds: number of measurements
+	@type rounds: number
+	@return: None
+	@rtype: None
+	'''
+	def render_model(passthrough, buffering):
+		f.seek(0)
+		f.truncate()
+		renderer = SpecFileRenderer(SpecModelReader(model))
+		renderer.passthrough = passthrough
+		renderer.buffering = buffering
+		renderer.render(f)
+		f.flush()
+
+	model = parse(content)
+	editor = SpecDefaultEditor(SpecModelReader(model), SpecModelWriter(model))
+	editor.provides_add({ 'devel': [ 'golang(example.com/pkg)' ] })
+
+	outputs = []
+	with tempfile.TemporaryFile() as f:
+		for passthrough, buffering in [ (False, False), (False, True), (True, True) ]:
+			t, _ = timeit(lambda: render_model(passthrough, buffering), rounds)
+			f.seek(0)
+			outputs.append(f.read())
+			LOGGER.info("%-20s %-10s %8.4fs" % ('passthrough' if passthrough else 'tokens',
+					'buffered' if buffering else '', t))
+
+	if outputs.count(outputs[0]) != len(outputs):
+		LOGGER.error("Error: rendered outputs differ")
+		sys.exit(1)
+
+def bench_stream(content, rounds):
+	'''
+	Measure time to the first output chunk and total time of rendering
+	a parsed model and of rendering sections while they are parsed
+	@param content: spec file content to be rendered
+	@type content: string
+	@param rounds: number of measurements
+	@type rounds: number
+	@return: None
+	@rtype: None
+	'''
+	class FirstChunk(object):
+		def __init__(self, start):
+			self.start = start
+			self.first = None
+			self.total = None
+			self.output = cStringIO.StringIO()
+
+		def write(self, chunk):
+			if self.first is None:
+				self.first = time.time() - self.start
+			self.output.write(chunk)
+
+	def model_render():
+		f = FirstChunk(time.time())
+		SpecFileRenderer(SpecModelReader(parse(content))).render(f)
+		f.total = time.time() - f.start
+		return f
+
+	def stream_render():
+		f = FirstChunk(time.time())
+		parser = SpecFileParser(SpecModelWriter())
+		parser.token_list = SpecTokenList(content)
+		SpecFileRenderer(SpecModelReader()).render_stream(parser.parse_sections(), f)
+		f.total = time.time() - f.start
+		return f
+
+	for name, func in [ ('model', model_render), ('stream', stream_render) ]:
+		first, t = None, None
+		for _ in xrange(rounds):
+			f = func()
+			first = f.first if first is None else min(first, f.first)
+			t = f.total if t is None else min(t, f.total)
+		LOGGER.info("%-20s first chunk %8.4fs total %8.4fs" % (name, first, t))
+
+		if f.output.getvalue() != content:
+			LOGGER.error("Error: rendered output differs from input")
+			sys.exit(1)
+
+def bench_query(content, rounds):
+	'''
+	Measure time to answer show operations on a whole parsed spec file and
+	on a spec file parsed only up to the last needed section
+	@param content: spec file content to be queried
+	@type content: string
+	@param rounds: number of measurements
+	@type rounds: number
+	@return: None
+	@rtype: None
+	@note: parsing stops after the last needed section, use a spec file
+	which is not multiplied to see a difference
+	'''
+	def query(section_types, show):
+		def func():
+			parser = SpecFileParser(SpecModelWriter())
+			parser.init(content)
+			if section_types is None:
+				parser.parse()
+			else:
+				parser.parse_partial(section_types)
+			output = cStringIO.StringIO()
+			show(SpecFileRenderer(SpecModelReader(parser.get_model_writer().get_model())), output)
+			return output.getvalue()
+		return func
+
+	queries = [
+		('provides', (SpecStDefinition, SpecStPackage), lambda spec, f: spec.provides_show(['*'], f)),
+		('description', (SpecStDescription,), lambda spec, f: spec.description_show(f)),
+		('prep', (SpecStPrep,), lambda spec, f: spec.prep_show(f))
+	]
+
+	for name, section_types, show in queries:
+		t_full, full = timeit(query(None, show), rounds)
+		t_partial, partial = timeit(query(section_types, show), rounds)
+		LOGGER.info("%-20s full %8.4fs partial %8.4fs" % (name, t_full, t_partial))
+
+		if full != partial:
+			LOGGER.error("Error: partial parse output differs from full parse output")
+			sys.exit(1)
+
+BENCHMARKS = {
+	'tokenizer': bench_tokenizer,
+	'token-memory': bench_token_memory,
+	'parse': bench_parse,
+	'lazy': bench_lazy,
+	'pool': bench_pool,
+	'edit': bench_edit,
+	'fork': bench_fork,
+	'render': bench_render,
+	'stream': bench_stream,
+	'query': bench_query
+}
+
+if __name__ == '__main__':
+	LOGGER.addHandler(logging.StreamHandler(sys.stdout))
+	LOGGER.setLevel(logging.INFO)
+	parser = optparse.OptionParser("%prog OPTIONS [BENCHMARK ...]")
+
+	parser.add_option(
+		"", "-i", "--input", dest="input", action = "store",
+		default = "./testsuite/golang-flannel.spec", help = "spec file used as an input"
+	)
+
+	parser.add_option(
+		"", "-m", "--multiply", dest="multiply", action = "store", type = "int",
+		default = 20, help = "concatenate input this many times to get a bigger spec"
+	)
+
+	parser.add_option(
+		"", "-r", "--rounds", dest="rounds", action = "store", type = "int",
+		default = 3, help = "number of measurements, the best one is reported"
+	)
+
+	options, args = parser.parse_args()
+
+	for name in args:
+		if name not in BENCHMARKS:
+			LOGGER.error("Error: unknown benchmark '%s'" % name)
+			sys.exit(1)
+
+	with open(options.input, 'r') as f:
+		content = f.read() * options.multiply
+
+	for name in (args or sorted(BENCHMARKS.keys())):
+		LOGGER.info(">>> %s" % name)
+		BENCHMARKS[name](content, options.rounds)
+
@@ -27,10 +27,30 @@ Library check tool
 '''
 
 import unittest
+import os
+import json
+import glob
 import sys
+import time
+import socket
+import shutil
+import tempfile
 import logging
 import optparse
+import cStringIO
+import itertools
 from subprocess import PIPE, Popen
+from modules.specError import SpecNotFound
+from modules.specFile import SpecFile
+from modules.specFileParser import SpecFileParser
+from modules.specFileRenderer import SpecDescriptionRenderer, SpecFileRenderer
+from modules.specModelReader import SpecModelReader
+from modules.specModelWriter import SpecModelWriter
+from modules.specSection import SpecStBuild, SpecStClean, SpecStDefinition, SpecStDescription, SpecStFiles, SpecStPackage, SpecStPrep, SpecStSection
+from modules.specServer import SpecRequestHandler
+from modules.specToken import SpecToken
+from modules.specTokenList import SpecTokenList
+from modules.specTokenizer import SpecRegexTokenizer
 
 LOGGER = logging.getLogger('specker-check')
 VERBOSE = False
@@ -150,6 +170,53 @@ def assertNoDiff(stdout, f, status):
 			print_status(status, additional = diff)
 			assert False
 
+def parse_model(path):
+	'''
+	Parse a spec file
+	@param path: spec file to be parsed
+	@type path: string
+	@return: model writer holding parsed spec model
+	@rtype: L{SpecModelWriter}
+	'''
+	parser = SpecFileParser(SpecModelWriter())
+	with open(path, 'r') as f:
+		parser.init(f)
+	parser.parse()
+	return parser.get_model_writer()
+
+def render_model(model, passthrough = True):
+	'''
+	Render a spec model
+	@param model: model to be rendered
+	@type model: L{SpecModel}
+	@param passthrough: if False, source text of sections is not used
+	@type passthrough: Boolean
+	@return: rendered spec file
+	@rtype: string
+	'''
+	renderer = SpecFileRenderer(SpecModelReader(model))
+	renderer.passthrough = passthrough
+	output = cStringIO.StringIO()
+	renderer.render(output)
+	return output.getvalue()
+
+def edit_model(model, value):
+	'''
+	Edit a spec model both by removing a section and in place
+	@param model: model to be edited
+	@type model: L{SpecModel}
+	@param value: value to be set
+	@type value: string
+	@return: None
+	@rtype: None
+	'''
+	writer = SpecModelWriter(model)
+	writer.remove(model.find_section(SpecStPrep)[0])
+	name = writer.own(model.find_definitions('Name:', [ None ])[0])
+	name.get_value()[0].set_token(value)
+	description = writer.own(model.find_section(SpecStDescription)[0])
+	description.get_tokens().token_list_append(SpecToken.create(value, append = '\n'))
+
 ################################################################################
 
 class TestGeneric(unittest.TestCase):
@@ -213,6 +280,79 @@ class TestGeneric(unittest.TestCase):
 		assertEqual(0, result['returncode'], result)
 		assertNoDiff(result['stdout'], output_file, result)
 
+	def test_batch(self):
+		input_files = [ "./testsuite/golang-flannel.spec", "./testsuite/sections_add_in.spec" ]
+		output_dir = tempfile.mkdtemp()
+		try:
+			result = run_specker(['--jobs=2', '--output-dir=%s' % output_dir, input_files[0],
+										"somenonlongnameofanonexistentfile", input_files[1]])
+			assertContains('1 of 3 spec files failed', result['stderr'], result)
+			assertEqual(3, result['returncode'], result)
+			for input_file in input_files:
+				with open(os.path.join(output_dir, os.path.basename(input_file)), 'r') as f:
+					assertNoDiff(f.read(), input_file, result)
+		finally:
+			shutil.rmtree(output_dir)
+
+	def test_output_input(self):
+		input_file = "./testsuite/golang-flannel.spec"
+		output_dir = tempfile.mkdtemp()
+		try:
+			output_file = os.path.join(output_dir, 'golang-flannel.spec')
+			shutil.copy(input_file, output_file)
+			result = run_specker(['-o', output_file, output_file])
+			assertEqual(0, result['returncode'], result)
+			with open(output_file, 'r') as f:
+				assertNoDiff(f.read(), input_file, result)
+		finally:
+			shutil.rmtree(output_dir)
+
+	def test_output_parse_error(self):
+		input_file = "./testsuite/description_colon.spec"
+		output_dir = tempfile.mkdtemp()
+		try:
+			bad_file = os.path.join(output_dir, 'bad.spec')
+			output_file = os.path.join(output_dir, 'out.spec')
+			with open(input_file, 'r') as f:
+				content = f.read().replace('Mon Jan 05 2015', 'Mon Foo 35 2015')
+			with open(bad_file, 'w') as f:
+				f.write(content)
+			result = run_specker(['-o', output_file, bad_file])
+			assertEqual(3, result['returncode'], result)
+			assertFalse(os.path.exists(output_file), result)
+		finally:
+			shutil.rmtree(output_dir)
+
+	def test_server(self):
+		input_file = "./testsuite/golang-flannel.spec"
+		socket_dir = tempfile.mkdtemp()
+		socket_path = os.path.join(socket_dir, 'specker.sock')
+		server = Popen(["./specker", "--serve=%s" % socket_path], stderr = PIPE)
+		try:
+			for _ in range(50): # wait for the server to start
+				if os.path.exists(socket_path):
+					break
+				time.sleep(0.1)
+
+			# an idle client must not block others
+			idle = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			idle.connect(socket_path)
+			try:
+				for _ in range(2): # parse, then reuse parsed model
+					start = time.time()
+					client = Popen(["./specker-client", socket_path, input_file], stdout = PIPE, stderr = PIPE)
+					stdout, stderr = client.communicate()
+					result = { 'stdout': stdout, 'stderr': stderr, 'returncode': client.returncode }
+					assertEqual(0, result['returncode'], result)
+					assertNoDiff(result['stdout'], input_file, result)
+					assert time.time() - start < SpecRequestHandler.timeout, "Client blocked by an idle client"
+			finally:
+				idle.close()
+		finally:
+			server.terminate()
+			server.wait()
+			shutil.rmtree(socket_dir)
+
 ################################################################################
 
 class TestModel(unittest.TestCase):
@@ -227,13 +367,308 @@ class TestModel(unittest.TestCase):
 		assertEqual(0, result['returncode'], result)
 		assertNoDiff(result['stdout'], output_file, result)
 
+	def test_package_add(self):
+		input_file = "./testsuite/golang-flannel.spec"
+		sections_file = "./testsuite/sections_add_package.spec"
+		result = run_specker([input_file, '--sections-add'], stdin = sections_file)
+		assertEqual(0, result['returncode'], result)
+		with open(input_file, 'r') as f:
+			content = f.read()
+		with open(sections_file, 'r') as f:
+			sections = f.read()
+		# placed after the last package description, nothing replaced
+		assertEqual(content.replace('%prep\n', sections + '%prep\n'), result['stdout'], result)
+
+		result = run_specker([input_file, '--sections-add', '--requires-show=extra'], stdin = sections_file)
+		assertEqual(0, result['returncode'], result)
+		assertEqual('extra:y\n', result['stdout'], result)
+
+		# adding the package again replaces it
+		output_dir = tempfile.mkdtemp()
+		try:
+			added_file = os.path.join(output_dir, 'added.spec')
+			with open(added_file, 'w') as f:
+				f.write(content.replace('%prep\n', sections + '%prep\n'))
+			sections_file2 = os.path.join(output_dir, 'sections.spec')
+			with open(sections_file2, 'w') as f:
+				f.write(sections.replace('Requires: y', 'Requires: z').replace('foo', 'bar'))
+			result = run_specker([added_file, '--sections-add'], stdin = sections_file2)
+			assertEqual(0, result['returncode'], result)
+			with open(sections_file2, 'r') as f:
+				assertEqual(content.replace('%prep\n', f.read() + '%prep\n'), result['stdout'], result)
+		finally:
+			shutil.rmtree(output_dir)
+
+	def test_package_name_created(self):
+		section = SpecStFiles(None)
+		section.set_token_section(SpecToken.create('%files'))
+		tokens = SpecTokenList()
+		tokens.token_list = [ SpecToken.create('devel', append = '\n'), SpecToken.create('/usr/bin/x', append = '\n') ]
+		section.set_tokens(tokens)
+		assertEqual('devel', section.get_package_name(), section.get_package_name())
+
+		writer = parse_model("./testsuite/golang-flannel.spec")
+		writer.add(section)
+		files = writer.get_model().find_package_sections('devel', SpecStFiles)
+		assertEqual([ section ], files, files)
+
+	def test_definition_rename(self):
+		model = parse_model("./testsuite/golang-flannel.spec").get_model()
+		provides = model.find_definitions('Provides:', [ 'devel' ])
+		assertEqual(model.find_definitions('PROVIDES:', [ 'devel' ]), provides, provides)
+
+		fork = model.fork()
+		provides[0].set_name(SpecToken.create('Conflicts:'))
+		assertEqual(provides[1:], model.find_definitions('provides:', [ 'devel' ]), provides)
+		assertEqual(provides[:1], model.find_definitions('Conflicts:', [ 'devel' ]), provides)
+		assertEqual(provides[:1], fork.find_definitions('Conflicts:', [ 'devel' ]), provides)
+		model.remove_definition(provides[0])
+		assertEqual([], model.find_definitions('Conflicts:'), provides)
+		assertEqual(provides[:1], fork.find_definitions('Conflicts:', [ 'devel' ]), provides)
+
+	def test_transaction(self):
+		writer = parse_model("./testsuite/golang-flannel.spec")
+		model = writer.get_model()
+		content = render_model(model)
+		prep = model.find_section(SpecStPrep)[0]
+
+		model.begin()
+		writer.remove(prep)
+		assertTrue(model.in_transaction(), model.transaction)
+		assertEqual(content, render_model(model), "Model modified before commit")
+		model.commit()
+		assertFalse(model.in_transaction(), model.transaction)
+		assertFalse(any(s is prep for s in model.get_sections()), "Section not removed")
+		assertEqual(None, model.find_section(SpecStPrep), model.find_section(SpecStPrep))
+
+	def test_transaction_add_index(self):
+		input_file = "./testsuite/golang-flannel.spec"
+		expected = parse_model(input_file)
+		for section in parse_model("./testsuite/sections_add_package.spec").get_model().get_sections():
+			expected.add(section)
+
+		writer = parse_model(input_file)
+		model = writer.get_model()
+		index_packages = model.index_packages
+		calls = []
+		model.index_packages = lambda entries: calls.append(entries) or index_packages(entries)
+		with writer.batch():
+			for section in parse_model("./testsuite/sections_add_package.spec").get_model().get_sections():
+				writer.add(section)
+
+		# added sections are placed first, indexes are rebuilt once
+		assertEqual(1, len(calls), calls)
+		assertEqual(render_model(expected.get_model()), render_model(model), "Sections placed differently")
+		assertEqual(1, len(model.find_package_sections('extra', SpecStPackage)), model.package_sections)
+		assertEqual(1, len(model.find_definitions('Requires:', [ 'extra' ])), model.definition_index)
+
+	def test_transaction_rollback(self):
+		writer = parse_model("./testsuite/golang-flannel.spec")
+		model = writer.get_model()
+		content = render_model(model)
+		sections = list(model.get_sections())
+		build = model.find_section(SpecStBuild)[0]
+
+		with self.assertRaises(ValueError):
+			with writer.batch():
+				writer.remove(build)
+				writer.append(SpecStClean(None))
+				raise ValueError("Batch failed")
+
+		assertFalse(model.in_transaction(), model.transaction)
+		assertEqual(map(id, sections), map(id, model.get_sections()), "Sections modified")
+		assertEqual([ build ], model.find_section(SpecStBuild), model.find_section(SpecStBuild))
+		assertEqual(content, render_model(model), "Model modified")
+
+	def test_transaction_remove_missing(self):
+		writer = parse_model("./testsuite/golang-flannel.spec")
+		model = writer.get_model()
+		content = render_model(model)
+		sections = list(model.get_sections())
+		prep = model.find_section(SpecStPrep)[0]
+
+		for removed in [ [ SpecStPrep(None) ], [ prep, prep ] ]: # not in model, removed twice
+			model.begin()
+			for section in removed:
+				writer.remove(section)
+			self.assertRaises(SpecNotFound, model.commit)
+			assertFalse(model.in_transaction(), model.transaction)
+			assertEqual(map(id, sections), map(id, model.get_sections()), "Sections modified")
+			assertEqual(content, render_model(model), "Model modified")
+
+		with self.assertRaises(SpecNotFound):
+			with writer.batch():
+				writer.remove(SpecStPrep(None))
+		assertFalse(model.in_transaction(), model.transaction)
+		assertEqual(content, render_model(model), "Model modified")
+
+	def test_transaction_add_remove(self):
+		writer = parse_model("./testsuite/golang-flannel.spec")
+		model = writer.get_model()
+		content = render_model(model)
+		sections = list(model.get_sections())
+
+		section = SpecStClean(None)
+		section.set_token_section(SpecToken.create('%clean', append = '\n'))
+		for add in [ writer.append, writer.add ]:
+			with writer.batch():
+				add(section)
+				writer.remove(section)
+			assertFalse(model.in_transaction(), model.transaction)
+			assertEqual(map(id, sections), map(id, model.get_sections()), "Sections modified")
+			assertEqual(None, model.find_section(SpecStClean), model.find_section(SpecStClean))
+			assertEqual(content, render_model(model), "Model modified")
+
+	def test_fork_edit(self):
+		model = parse_model("./testsuite/golang-flannel.spec").get_model()
+		content = render_model(model)
+		expected = parse_model("./testsuite/golang-flannel.spec").get_model()
+		edit_model(expected, 'forked')
+
+		fork = model.fork()
+		edit_model(fork, 'forked')
+		assertEqual(render_model(expected), render_model(fork), "Fork not edited")
+		assertEqual(content, render_model(model), "Fork edit leaked to the original model")
+		assertEqual(1, len(model.find_section(SpecStPrep)), model.find_section(SpecStPrep))
+
+	def test_fork_edit_original(self):
+		model = parse_model("./testsuite/golang-flannel.spec").get_model()
+		content = render_model(model)
+		expected = parse_model("./testsuite/golang-flannel.spec").get_model()
+		edit_model(expected, 'original')
+
+		fork = model.fork()
+		edit_model(model, 'original')
+		assertEqual(render_model(expected), render_model(model), "Model not edited")
+		assertEqual(content, render_model(fork), "Original model edit leaked to the fork")
+		assertEqual(1, len(fork.find_section(SpecStPrep)), fork.find_section(SpecStPrep))
+
+	def test_fork_of_fork(self):
+		model = parse_model("./testsuite/golang-flannel.spec").get_model()
+		content = render_model(model)
+		expected = {}
+		for value in [ 'fork1', 'fork2' ]:
+			expected[value] = parse_model("./testsuite/golang-flannel.spec").get_model()
+			edit_model(expected[value], value)
+
+		fork1 = model.fork()
+		fork2 = fork1.fork()
+		with SpecModelWriter(fork2).batch():
+			edit_model(fork2, 'fork2')
+		assertEqual(render_model(expected['fork2']), render_model(fork2), "Fork of fork not edited")
+		assertEqual(content, render_model(fork1), "Fork of fork edit leaked to the fork")
+		assertEqual(content, render_model(model), "Fork of fork edit leaked to the original model")
+
+		edit_model(fork1, 'fork1')
+		assertEqual(render_model(expected['fork1']), render_model(fork1), "Fork not edited")
+		assertEqual(render_model(expected['fork2']), render_model(fork2), "Fork edit leaked to the fork of fork")
+		assertEqual(content, render_model(model), "Fork edit leaked to the original model")
+
 ################################################################################
 
 class TestFileParser(unittest.TestCase):
 	'''
 	Test L{SpecFileParser}
 	'''
-	pass
+	def test_parse_cache(self):
+		input_file = "./testsuite/golang-flannel.spec"
+		cache_dir = tempfile.mkdtemp()
+		try:
+			for _ in range(2): # store, then load
+				result = run_specker(['--cache-dir=%s' % cache_dir, input_file])
+				assertEqual(0, result['returncode'], result)
+				assertNoDiff(result['stdout'], input_file, result)
+				assertEqual(1, len(os.listdir(cache_dir)), result)
+		finally:
+			shutil.rmtree(cache_dir)
+
+		# an edited custom parser invalidates cached results
+		cache_dir = tempfile.mkdtemp()
+		try:
+			source_file = os.path.join(cache_dir, 'custom_parser.py')
+			for idx, source in enumerate([ 'custom_parsers = []\n', 'custom_parsers = []\n', 'custom_parsers = [ ]\n' ]):
+				with open(source_file, 'w') as f:
+					f.write(source)
+				result = run_specker(['--cache-dir=%s' % cache_dir, '--custom-parser=%s' % source_file, input_file])
+				assertEqual(0, result['returncode'], result)
+				assertNoDiff(result['stdout'], input_file, result)
+				assertEqual([ 1, 1, 2 ][idx], len(glob.glob(os.path.join(cache_dir, '*.spc'))), result)
+		finally:
+			shutil.rmtree(cache_dir)
+
+		result = run_specker(['--cache-size=1', input_file])
+		assertEqual(2, result['returncode'], result)
+		assertContains('--cache-size can be used only with --cache-dir', result['stderr'], result)
+
+	def test_description_colon(self):
+		input_file = "./testsuite/description_colon.spec"
+		result = run_specker([input_file])
+		assertEqual(0, result['returncode'], result)
+		assertNoDiff(result['stdout'], input_file, result)
+
+		result = run_specker(['--description-show', input_file])
+		assertEqual(0, result['returncode'], result)
+		assertContains('This tool provides: nothing.\nMore text follows', result['stdout'], result)
+		assertContains('and neither is name: foo.\n', result['stdout'], result)
+
+	def test_parse_partial(self):
+		input_file = "./testsuite/golang-flannel.spec"
+		cache_dir = tempfile.mkdtemp()
+		try:
+			for show in [ '--prep-show', '--description-show', '--package-show', '--provides-show=*' ]:
+				# parse cache needs whole spec files parsed
+				full = run_specker(['--cache-dir=%s' % cache_dir, show, input_file])
+				assertEqual(0, full['returncode'], full)
+				result = run_specker([show, input_file])
+				assertEqual(0, result['returncode'], result)
+				assertEqual(full['stdout'], result['stdout'], result)
+		finally:
+			shutil.rmtree(cache_dir)
+
+	def test_scan_limit(self):
+		with open("./testsuite/golang-flannel.spec", 'r') as f:
+			content = f.read()
+
+		parser = SpecFileParser(SpecModelWriter())
+		parser.init(content)
+		# tags in %changelog and section bodies are not taken as definitions
+		limit = parser.get_scan_limit((SpecStDefinition, SpecStPackage))
+		assertTrue(content.rindex('Provides:') < limit < content.index('%prep'), limit)
+		assertTrue(limit < content.index('%changelog'), limit)
+
+	def test_tokenizer_newlines(self):
+		with open("./testsuite/golang-flannel.spec", 'r') as f:
+			content = f.read()
+		content *= 2 * SpecFile.NEWLINES_CHUNK / len(content) + 1
+
+		spec_file = SpecFile(content)
+		spans = SpecRegexTokenizer.spans(spec_file)
+		for span in itertools.islice(spans, 10):
+			assertEqual(content.count('\n', 0, span[0] + span[1]) + 1, span[4], span)
+		# new lines are indexed only as far as the file is lexed
+		assertTrue(spec_file.newlines_end < spec_file.length, spec_file.newlines_end)
+
+		for span in spans:
+			assertEqual(content.count('\n', 0, span[0] + span[1]) + 1, span[4], span)
+		assertEqual(content.count('\n'), len(spec_file.get_newlines()), len(spec_file.get_newlines()))
+
+	def test_continuations(self):
+		with open("./testsuite/golang-flannel.spec", 'r') as f:
+			content = f.read()
+		content *= 2 * SpecFile.NEWLINES_CHUNK / len(content) + 1
+		# escaped new line split across the first chunk boundary
+		boundary = SpecFile.NEWLINES_CHUNK
+		content = content[:boundary - 1] + '\\\n' + content[boundary - 1:]
+
+		spec_file = SpecFile(content)
+		assertEqual(content.count('\\\n', 0, 100), spec_file.count_continuations(0, 100), content[:100])
+		# continuations are indexed only as far as they are counted
+		assertTrue(len(spec_file.continuations) < content.count('\\\n'), len(spec_file.continuations))
+
+		start = boundary - 100
+		end = boundary + 100
+		assertEqual(content.count('\\\n', start, end), spec_file.count_continuations(start, end), content[start:end])
+		assertEqual(content.count('\\\n'), len(spec_file.get_continuations()), spec_file.get_continuations())
 
 ################################################################################
 
@@ -241,7 +676,35 @@ class TestDefaultEditor(unittest.TestCase):
 	'''
 	Test L{SpecDefaultEditor}
 	'''
-	pass
+	def test_provides_subpackage(self):
+		input_file = "./testsuite/golang-flannel.spec"
+		provides = 'golang(%{import_path}/backend/alloc)=%{version}-%{release}'
+		result = run_specker(['--provides-show=devel', input_file])
+		assertEqual(0, result['returncode'], result)
+		assertEqual(11, len(result['stdout'].splitlines()), result)
+		assertContains('devel:%s\n' % provides, result['stdout'], result)
+
+		result = run_specker(['--provides-remove=devel:%s' % provides, '--provides-add=devel:foo',
+								'--provides-show=devel', input_file])
+		assertEqual(0, result['returncode'], result)
+		assertFalse(provides in result['stdout'], result)
+		assertTrue(result['stdout'].endswith('devel:foo\n'), result)
+
+	def test_provides_lowercase(self):
+		output_dir = tempfile.mkdtemp()
+		try:
+			input_file = os.path.join(output_dir, 'lowercase.spec')
+			with open(input_file, 'w') as f:
+				f.write('Name: t\nprovides: bar\nProvides: baz\n\n%description\nText\n')
+			result = run_specker(['--provides-show=-', input_file])
+			assertEqual(0, result['returncode'], result)
+			assertEqual('-:bar\n-:baz\n', result['stdout'], result)
+
+			result = run_specker(['--provides-remove=bar', '--provides-show=-', input_file])
+			assertEqual(0, result['returncode'], result)
+			assertEqual('-:baz\n', result['stdout'], result)
+		finally:
+			shutil.rmtree(output_dir)
 
 ################################################################################
 
@@ -249,7 +712,85 @@ class TestFileRenderer(unittest.TestCase):
 	'''
 	Test L{SpecFileRenderer}
 	'''
-	pass
+	def test_show_multiple(self):
+		input_file = "./testsuite/golang-flannel.spec"
+		shows = [ '--requires-show=*', '--buildrequires-show=*', '--changelog-show' ]
+		single = {}
+		for show in shows:
+			result = run_specker([show, input_file])
+			assertEqual(0, result['returncode'], result)
+			single[show.split('-')[2]] = result['stdout']
+
+		result = run_specker(shows + [ '--show-json', input_file ])
+		assertEqual(0, result['returncode'], result)
+		assertEqual(single, json.loads(result['stdout']), result)
+
+		result = run_specker(shows + [ input_file ])
+		assertEqual(0, result['returncode'], result)
+		expected = ''.join("[%s]\n%s" % (name, single[name]) for name in [ 'requires', 'buildrequires', 'changelog' ])
+		assertEqual(expected, result['stdout'], result)
+
+	def test_show_package(self):
+		input_file = "./testsuite/golang-flannel.spec"
+		outputs = []
+		for pkg in [ 'devel', 'flannel-devel', '-n flannel-devel' ]:
+			result = run_specker(['--files-show', '--description-show', '--packages=%s' % pkg, input_file])
+			assertEqual(0, result['returncode'], result)
+			outputs.append(result['stdout'])
+		assertEqual(1, len(set(outputs)), outputs)
+		assertTrue(outputs[0].startswith('[description]\n%description devel\n'), outputs[0])
+		assertContains('[files]\n%files devel\n', outputs[0], outputs[0])
+
+		result = run_specker(['--files-show', '--packages=-', input_file])
+		assertEqual(0, result['returncode'], result)
+		assertTrue(result['stdout'].startswith('%files\n'), result)
+		assertFalse('%files devel' in result['stdout'], result)
+
+	def test_renderer_base_class(self):
+		class BaseRenderer(SpecDescriptionRenderer):
+			obj = SpecStSection
+
+			def render(self, f, ctx):
+				f.write('<%s>' % self.section.__class__.__name__)
+
+		model = parse_model("./testsuite/golang-flannel.spec").get_model()
+		renderer = SpecFileRenderer(SpecModelReader(model))
+		renderer.register(BaseRenderer)
+		output = cStringIO.StringIO()
+		renderer.render(output)
+		output = output.getvalue()
+		# all renderers the section class matches apply
+		assertContains('%build\n', output, output)
+		assertContains('<SpecStBuild>', output, output)
+		assertContains('<SpecStDescription>', output, output)
+		assertFalse('%description' in output, output)
+
+	def test_token_edit(self):
+		input_file = "./testsuite/golang-flannel.spec"
+		model = parse_model(input_file).get_model()
+		for s in model.find_section(SpecStDefinition):
+			if str(s.get_name()) == 'Name:':
+				s.get_value()[0].set_token('CHANGED')
+		output = render_model(model)
+		assertContains('CHANGED', output, output)
+		assertEqual(render_model(model, False), output, output)
+
+		model = parse_model(input_file).get_model()
+		model.find_section(SpecStDescription)[0].get_tokens().token_list_append(
+				SpecToken.create('APPENDED', append = '\n'))
+		output = render_model(model)
+		assertContains('APPENDED\n', output, output)
+		assertEqual(render_model(model, False), output, output)
+
+		# reading tokens does not mark the section modified
+		model = parse_model(input_file).get_model()
+		description = model.find_section(SpecStDescription)[0]
+		tokens = description.get_tokens().token_list
+		tokens.append(SpecToken.create('IGNORED', append = '\n'))
+		assertFalse(description.is_dirty(), description.get_tokens().get_raw())
+		assertFalse('IGNORED' in description.get_tokens().get_raw(), description.get_tokens().get_raw())
+		with open(input_file, 'r') as f:
+			assertEqual(f.read(), render_model(model), "Source text not used")
 
 ################################################################################
 
@@ -26,6 +26,7 @@ A spec model editor
 '''
 
 import re
+import cStringIO
 from specSection import *
 from specDebug import SpecDebug
 from specToken import SpecToken
@@ -122,6 +123,7 @@ class SpecDefaultEditor(SpecModelEditor):
 			if len(s) > 1:
 				raise SpecNotImplemented("Cannot edit more then one section")
 
+			s[0] = self.get_model_writer().own(s[0])
 			SpecDebug.debug("- editing section '%s'" % str(s[0]))
 			self.get_editor(s[0]).edit(s[0], replacement)
 		elif verbose:
@@ -138,9 +140,10 @@ class SpecDefaultEditor(SpecModelEditor):
 		@rtype: None
 		@todo: remove/use only model to add?
 		'''
-		for section in sections:
-			SpecDebug.debug("- adding section '%s'" % type(section))
-			self.get_model_writer().add(section)
+		with self.get_model_writer().batch():
+			for section in sections:
+				SpecDebug.debug("- adding section '%s'" % type(section))
+				self.get_model_writer().add(section)
 
 	def find_section_add(self, section_type, items, verbose = True):
 		'''
@@ -159,6 +162,7 @@ class SpecDefaultEditor(SpecModelEditor):
 		s = self.get_model_reader().find_section(section_type)
 
 		if s is not None:
+			s[0] = self.get_model_writer().own(s[0])
 			SpecDebug.debug("- adding section to '%s'", type(s[0]))
 			self.get_editor(s[0]).add(s[0], items)
 		elif verbose:
@@ -181,23 +185,18 @@ class SpecDefaultEditor(SpecModelEditor):
 		definition_editor = self.get_editor_class(SpecStDefinition)
 		package_editor = self.get_editor_class(SpecStPackage)
 
-		for pkg in packages:
-			if pkg == '-':
-				for val in packages['-']:
-					d = definition_editor.create(None, definition, val)
-					self.get_model_writer().add(d)
-			else:
-				found = False
-				for st_pkg in self.get_model_reader().get_sections():
-					if issubclass(st_pkg.__class__, SpecStPackage):
-						if st_pkg.pkg != None and str(st_pkg.get_package()) == pkg:
-							found = True
-							for val in packages[str(st_pkg.get_package())]:
-								d = definition_editor.create(st_pkg, definition, val)
-								package_editor.add_definition(st_pkg, d)
-
-				if not found:
-					raise SpecNotFound("Package '%s' not found" % pkg)
+		with self.get_model_writer().batch():
+			for pkg in packages:
+				if pkg == '-':
+					for val in packages['-']:
+						d = definition_editor.create(None, definition, val)
+						self.get_model_writer().add(d)
+				else:
+					st_pkg = self.get_model_writer().own(self.find_package(pkg))
+					for val in packages[pkg]:
+						d = definition_editor.create(st_pkg, definition, val)
+						package_editor.add_definition(st_pkg, d)
+						self.get_model_writer().index_definition(d)
 
 	def find_definition_remove(self, definition, packages):
 		'''
@@ -211,22 +210,35 @@ class SpecDefaultEditor(SpecModelEditor):
 		@rtype: None
 		@raise SpecNotFound: if package is not found
 		'''
-		for pkg in packages:
-			if pkg == '-':
-				for st_def in self.get_model_reader().model.get_sections():
-					if issubclass(st_def.__class__, SpecStDefinition):
-						if definition.match(str(st_def.get_name())):
-							for val in packages['-']:
-								if st_def.get_value() == val:
-									self.get_model_writer().remove(st_def)
-			else:
-				found = False
-				for st_pkg in self.get_model_reader().model.get_sections():
-					if type(st_pkg) is SpecStPackage:
-						if st_pkg.pkg != None and str(st_pkg.pkg) == pkg:
-								st_pkg.remove_definition(definition, packages[pkg])
-				if not found:
-					raise SpecNotFound("Package '%s' not found" % pkg)
+		with self.get_model_writer().batch():
+			for pkg in packages:
+				if pkg == '-' or pkg is None:
+					name = None
+				else:
+					name = pkg
+					self.find_package(pkg)
+
+				# values are compared without whitespaces as rendered when shown
+				vals = set(''.join(val.split()) for val in packages[pkg])
+				for st_def in self.get_model_reader().find_definitions(definition, [name]):
+					value = cStringIO.StringIO()
+					st_def.get_value().write(value, raw = True)
+					if value.getvalue() in vals:
+						self.get_model_writer().remove_definition(st_def)
+
+	def find_package(self, pkg):
+		'''
+		Find a package section
+		@param pkg: package name, e.g. 'devel', '-n foo-devel' or 'foo-devel'
+		@type pkg: string
+		@return: package section
+		@rtype: L{SpecStPackage}
+		@raise SpecNotFound: if package is not found
+		'''
+		ret = self.get_model_reader().find_package(pkg)
+		if ret is None:
+			raise SpecNotFound("Package '%s' not found" % pkg)
+		return ret
 
 	################################################################################
 
@@ -252,7 +264,7 @@ class SpecDefaultEditor(SpecModelEditor):
 		@rtype: None
 		@raise SpecNotFound: if package is not found
 		'''
-		self.find_definition_remove(re.compile('Provides:'), packages)
+		self.find_definition_remove('Provides:', packages)
 
 	def requires_add(self, packages):
 		'''
@@ -276,7 +288,7 @@ class SpecDefaultEditor(SpecModelEditor):
 		@rtype: None
 		@raise SpecNotFound: if package is not found
 		'''
-		self.find_definition_remove(re.compile('Requires:'), packages)
+		self.find_definition_remove('Requires:', packages)
 
 	def buildrequires_add(self, packages):
 		'''
@@ -300,7 +312,7 @@ class SpecDefaultEditor(SpecModelEditor):
 		@rtype: None
 		@raise SpecNotFound: if package is not found
 		'''
-		return self.find_definition_remove(re.compile('BuildRequires:'), packages)
+		return self.find_definition_remove('BuildRequires:', packages)
 
 	def changelogentry_add(self, date, username, email, version, msg):
 		'''
@@ -326,6 +338,7 @@ class SpecDefaultEditor(SpecModelEditor):
 		if len(changelog) != 1:
 			raise SpecNotFound("Cannot add changelog entry, changelog not found")
 
+		changelog[0] = self.get_model_writer().own(changelog[0])
 		self.get_editor(changelog[0]).add_entry(changelog[0], date, username, email, version, msg)
 
 	def description_edit(self, replacement, package = None):
@@ -431,14 +444,13 @@ class SpecDefaultEditor(SpecModelEditor):
 		@todo: rename to packages_remove()
 		'''
 		for item in items:
-			for st_pkg in self.get_model_reader().get_sections():
-				if not issubclass(st_pkg.__class__, SpecStPackage):
-					continue
-
-				if (item == '-' or item is None) and st_pkg.get_package() is None:
-					self.get_model_writer().remove(st_pkg)
-				elif item is not None and st_pkg.get_package() is not None and \
-						item == str(st_pkg.get_package()):
+			if item == '-' or item is None:
+				for st_pkg in self.get_model_reader().find_section(SpecStPackage) or []:
+					if st_pkg.get_package() is None:
+						self.get_model_writer().remove(st_pkg)
+			else:
+				st_pkg = self.get_model_reader().find_package(item)
+				if st_pkg is not None:
 					self.get_model_writer().remove(st_pkg)
 
 	def prep_edit(self, replacement):
@@ -25,28 +25,88 @@ A spec FILE abstraction
 @license: GPL 2.0
 '''
 
+import os
+import re
 import sys
+import mmap
+import stat
+from array import array
+from bisect import bisect_left
 from specError import SpecBadIndex
 
 class SpecFile:
 	'''
 	A file abstraction with relative and absolute access using a pointer into
 	a buffer.
+	@note: regular files are memory-mapped, content is then a read-only mmap
+	object; stdin, pipes and strings are read into a string
+	@note: offsets of new lines are indexed incrementally up to the furthest
+	offset looked up, see L{index_newlines}
+	@cvar NEWLINE_RE: pattern matching a new line
+	@cvar CONTINUATION_RE: pattern matching an escaped new line
+	@cvar NEWLINES_CHUNK: minimal number of bytes new lines are indexed in
 	'''
-	def __init__(self, spec):
+	NEWLINE_RE = re.compile('\n')
+	CONTINUATION_RE = re.compile(r'\\\n')
+	NEWLINES_CHUNK = 65536
+
+	def __init__(self, spec, use_mmap = True):
 		'''
 		Initialize C{SpecFile}
 		@param spec: file or string to be read
 		@type spec: file or string
+		@param use_mmap: if True, try to memory-map a file instead of reading it
+		@type use_mmap: Boolean
 		@return: None
 		@rtype: None
 		'''
 		if type(spec) is file:
-			self.content = spec.read()
+			self.content = None
+			if use_mmap:
+				self.content = SpecFile.map_file(spec)
+			if self.content is None:
+				self.content = spec.read()
 		else: # string
 			self.content = spec
 		self.pointer = 0
 		self.length = len(self.content)
+		self.newlines = array('l')
+		self.newlines_end = 0
+		self.continuations = array('l')
+
+	@staticmethod
+	def from_path(path, use_mmap = True):
+		'''
+		Create C{SpecFile} from a file path
+		@param path: path to a spec file
+		@type path: string
+		@param use_mmap: if True, try to memory-map a file instead of reading it
+		@type use_mmap: Boolean
+		@return: spec file
+		@rtype: L{SpecFile}
+		'''
+		with open(path, 'r') as f:
+			return SpecFile(f, use_mmap)
+
+	@staticmethod
+	def map_file(f):
+		'''
+		Memory-map a file
+		@param f: file to be mapped
+		@type f: file
+		@return: read-only mmap of the whole file or None if the file cannot be
+		mapped (stdin, pipe, empty file, partially read file)
+		@rtype: mmap
+		'''
+		try:
+			fd = f.fileno()
+			info = os.fstat(fd)
+			if not stat.S_ISREG(info.st_mode) or info.st_size == 0 or f.tell() != 0:
+				return None
+			# mmap keeps its own file descriptor, f can be closed afterwards
+			return mmap.mmap(fd, 0, access = mmap.ACCESS_READ)
+		except (EnvironmentError, ValueError, mmap.error):
+			return None
 
 	def in_file(self, position = None):
 		'''
@@ -146,3 +206,101 @@ class SpecFile:
 		'''
 		self.pointer = 0
 
+	def index_newlines(self, offset):
+		'''
+		Index offsets of new lines and escaped new lines before an offset, the
+		index is extended in chunks of L{NEWLINES_CHUNK} bytes so the file is
+		scanned only as far as it is read
+		@param offset: offset within the file
+		@type offset: number
+		@return: offset new lines are indexed up to (exclusive), new lines
+		after it are not indexed yet
+		@rtype: number
+		'''
+		if offset > self.newlines_end:
+			end = min(max(offset, self.newlines_end + self.NEWLINES_CHUNK), self.length)
+			self.newlines.extend(m.start() for m in self.NEWLINE_RE.finditer(self.content, self.newlines_end, end))
+			# '\\' of an escaped new line can end the previous chunk
+			self.continuations.extend(m.start() + 1 for m in self.CONTINUATION_RE.finditer(self.content,
+												max(self.newlines_end - 1, 0), end))
+			self.newlines_end = end
+		return self.newlines_end
+
+	def get_newlines(self):
+		'''
+		Get offsets of all new lines, the whole file is indexed
+		@return: sorted offsets of new line characters
+		@rtype: array of numbers
+		'''
+		self.index_newlines(self.length)
+		return self.newlines
+
+	def get_continuations(self):
+		'''
+		Get offsets of all escaped new lines, the whole file is indexed
+		@return: sorted offsets of new line characters preceded by '\\'
+		@rtype: array of numbers
+		'''
+		self.index_newlines(self.length)
+		return self.continuations
+
+	def get_line(self, offset):
+		'''
+		Get line number of an offset
+		@param offset: offset within the file
+		@type offset: number
+		@return: line number, starting with 1
+		@rtype: number
+		'''
+		self.index_newlines(offset)
+		return bisect_left(self.newlines, offset) + 1
+
+	def get_position(self, offset):
+		'''
+		Get line and column of an offset
+		@param offset: offset within the file
+		@type offset: number
+		@return: line and column, both starting with 1
+		@rtype: tuple (number, number)
+		'''
+		self.index_newlines(offset)
+		newlines = self.newlines
+		idx = bisect_left(newlines, offset)
+		line_start = newlines[idx - 1] + 1 if idx > 0 else 0
+		return (idx + 1, offset - line_start + 1)
+
+	def get_line_offsets(self, first, last = None):
+		'''
+		Get offsets of a line range
+		@param first: first line of the range, starting with 1
+		@type first: number
+		@param last: last line of the range, first if None
+		@type last: number
+		@return: offset of the first character and offset after the last
+		character (including new line) of the range
+		@rtype: tuple (number, number)
+		@raise SpecBadIndex: if a line is out of file
+		'''
+		newlines = self.get_newlines()
+		if last is None:
+			last = first
+		if first < 1 or last < first or first > len(newlines) + 1:
+			raise SpecBadIndex('Line out of file')
+
+		start = newlines[first - 2] + 1 if first > 1 else 0
+		end = newlines[last - 1] + 1 if last <= len(newlines) else self.length
+		return (start, end)
+
+	def count_continuations(self, start, end):
+		'''
+		Count escaped new lines within a range
+		@param start: offset of the range beginning
+		@type start: number
+		@param end: offset after the range end
+		@type end: number
+		@return: number of escaped new lines
+		@rtype: number
+		'''
+		self.index_newlines(end)
+		continuations = self.continuations
+		return bisect_left(continuations, end) - bisect_left(continuations, start)
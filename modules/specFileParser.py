@@ -32,9 +32,11 @@ import re
 import sys
 from specDebug import SpecDebug
 from specError import SpecBadToken, SpecBadIf
+from specFile import SpecFile
 from specModel import SpecModel
 from specModelParser import SpecModelParser
 from specSection import *
+from specTokenKind import SpecTokenKind
 from specTokenList import SpecTokenList
 
 class SpecFileParser(SpecModelParser):
@@ -43,6 +45,9 @@ class SpecFileParser(SpecModelParser):
 	'''
 	def __init__(self, writer):
 		self.token_list = None
+		self.spec_file = None
+		self.cache = None
+		self.tail = None
 		self.set_model_writer(writer)
 		self.MANIPULATORS = [
 				SpecIfParser,
@@ -72,16 +77,130 @@ class SpecFileParser(SpecModelParser):
 				SpecTriggerpostunParser,
 				SpecVerifyscriptParser
 			]
+		self.build_dispatch()
+
+	def register(self, manipulator):
+		'''
+		Register a section parser and rebuild keyword dispatch table
+		@param manipulator: a parser to be registered
+		@type manipulator: L{SpecSectionParser}
+		@return: None
+		@rtype: None
+		@raise SpecNotFound: if provided parser cannot be registered
+		'''
+		SpecModelParser.register(self, manipulator)
+		self.build_dispatch()
+
+	def build_dispatch(self):
+		'''
+		Build keyword dispatch table from registered parsers so a section
+		beginning is found by a single lookup, parsers which cannot state
+		their keywords (patterns or custom section_beginning()) are
+		checked one by one; token kinds which can begin a section are
+		collected as well so other tokens are rejected by kind
+		@return: None
+		@rtype: None
+		'''
+		self.keywords = {}
+		self.fallback = []
+		self.kinds = set()
+
+		for idx, parser in enumerate(self.MANIPULATORS):
+			keywords = parser.get_dispatch_keywords()
+			if keywords is None:
+				self.fallback.append((idx, parser, None, None))
+				self.kinds = None
+				continue
+
+			for keyword, section in keywords.iteritems():
+				if keyword not in self.keywords:
+					self.keywords[keyword] = (idx, parser, section)
+				if self.kinds is not None:
+					self.kinds.add(SpecTokenKind.classify(keyword))
+
+			patterns = parser.get_patterns()
+			if patterns:
+				kinds = parser.get_pattern_kinds()
+				self.fallback.append((idx, parser, patterns, kinds))
+				if kinds is None:
+					self.kinds = None
+				elif self.kinds is not None:
+					self.kinds.update(kinds)
+
+	def dispatch(self, token_list):
+		'''
+		Find parser of the upcoming section
+		@param token_list: token list to be used
+		@type token_list: L{SpecTokenList}
+		@return: parser to be used and section it reported or (None, None)
+		@rtype: tuple (L{SpecSectionParser}, L{SpecSection})
+		'''
+		kind = token_list.touch_kind()
+		if self.kinds is not None and kind not in self.kinds:
+			return None, None
+
+		token = str(token_list.touch())
+
+		ret = self.keywords.get(token)
+		if ret is None:
+			idx, parser, section = len(self.MANIPULATORS), None, None
+		else:
+			idx, parser, section = ret
+
+		# parsers listed before the keyword owner take precedence
+		for fallback_idx, fallback_parser, patterns, kinds in self.fallback:
+			if fallback_idx >= idx:
+				break
+
+			if kinds is not None and kind not in kinds:
+				continue
+
+			if patterns is not None and not [ p for p in patterns if p.match(token) ]:
+				continue
+
+			fallback_section = fallback_parser.section_beginning(token_list)
+			if fallback_section is not None:
+				return fallback_parser, fallback_section
+
+		return parser, section
 
 	def init(self, f):
 		'''
 		Init parser
-		@param f: FILE or a string to init parser from
-		@type f: FILE or a string
+		@param f: FILE, a string or L{SpecFile} to init parser from
+		@type f: FILE, a string or L{SpecFile}
 		@return: None
 		@rtype: None
 		'''
-		self.token_list = SpecTokenList(f)
+		self.spec_file = f if isinstance(f, SpecFile) else SpecFile(f)
+		self.token_list = SpecTokenList(self.spec_file)
+		self.tail = None
+
+	def set_cache(self, cache):
+		'''
+		Set a parse cache to be used by L{parse}
+		@param cache: parse cache or None to disable caching
+		@type cache: L{SpecParseCache}
+		@return: None
+		@rtype: None
+		'''
+		self.cache = cache
+
+	def get_cache(self):
+		'''
+		Get used parse cache
+		@return: parse cache or None if caching is disabled
+		@rtype: L{SpecParseCache}
+		'''
+		return self.cache
+
+	def get_cache_salt(self):
+		'''
+		Get data parsed result depends on except the spec file content
+		@return: names of registered section parsers
+		@rtype: string
+		'''
+		return ','.join(p.__module__ + '.' + p.__name__ for p in self.MANIPULATORS)
 
 	@staticmethod
 	def section_beginning_callback(obj, token_list):
@@ -105,12 +224,7 @@ class SpecFileParser(SpecModelParser):
 		@return: section parser to be used to parse the upcoming section
 		@rtype: L{SpecModelParser}
 		'''
-		for parser in self.MANIPULATORS:
-			ret = parser.section_beginning(token_list)
-			if ret is not None:
-				return parser
-
-		return None # Not found
+		return self.dispatch(token_list)[0]
 
 	@staticmethod
 	def section_beginning_callback_no_if(obj, token_list):
@@ -134,11 +248,11 @@ class SpecFileParser(SpecModelParser):
 		@return: section parser to be used to parse the upcoming section
 		@rtype: L{SpecModelParser}
 		'''
-		for parser in self.MANIPULATORS:
-			ret = parser.section_beginning(token_list)
-			if ret is not None and not issubclass(ret, SpecStIf) \
-					and not issubclass(ret, SpecStTag) and not issubclass(ret, SpecStGlobal):
-				return parser
+		parser, ret = self.dispatch(token_list)
+		if ret is not None and not issubclass(ret, SpecStIf) \
+				and not issubclass(ret, SpecStTag) and not issubclass(ret, SpecStGlobal) \
+				and parser.section_beginning_in_body(token_list):
+			return parser
 
 		return None # Not found
 
@@ -154,8 +268,20 @@ class SpecFileParser(SpecModelParser):
 		@return: list of parsed sections
 		@rtype: L{SpecSection}
 		'''
-		ret = []
+		return list(self.iter_loop(token_list, parent, allowed))
 
+	def iter_loop(self, token_list, parent, allowed):
+		'''
+		Parse sections one by one, see L{parse_loop}
+		@param token_list: a list of tokens to be used
+		@type token_list: L{SpecTokenList}
+		@param parent: parent section
+		@type parent: L{SpecSection}
+		@param allowed: allowed sections to be parsed, section parsers
+		@type allowed: list of L{SpecSectionParser}
+		@return: parsed sections, each is yielded as soon as it is parsed
+		@rtype: generator of L{SpecSection}
+		'''
 		found = True
 		while found:
 			found = False
@@ -166,17 +292,27 @@ class SpecFileParser(SpecModelParser):
 				break
 
 			for t in allowed:
+				begin = token_list.get_pointer()
 				section = t.parse(token_list, parent, allowed, self)
 				if section:
 					found = True
 					SpecDebug.debug("- adding parsed section '%s'" % type(section))
-					ret.append(section)
+					span = token_list.get_span(begin, token_list.get_pointer())
+					if span is not None:
+						section.set_span(*span)
+					yield section
 					break
 
 			if not found:
-				SpecDebug.debug("- unparsed token '%s' on line %s" % (str(token), str(token.line)))
+				SpecDebug.debug("- unparsed token '%s' on %s" % (str(token), token.get_position_str()))
 
-		return ret
+	def get_preamble_parsers(self):
+		'''
+		Get section parsers used in preamble
+		@return: section parsers
+		@rtype: list of L{SpecSectionParser}
+		'''
+		return [ SpecIfParser, SpecDefinitionParser, SpecGlobalParser, SpecTagParser, SpecDefineParser ]
 
 	def parse_preamble(self):
 		'''
@@ -184,11 +320,9 @@ class SpecFileParser(SpecModelParser):
 		@return: parsed sections in preamble
 		@rtype: list of L{SpecSection}
 		'''
-		allowed = [ SpecIfParser, SpecDefinitionParser, SpecGlobalParser, SpecTagParser, SpecDefineParser ]
-
-		ret = self.parse_loop(self.token_list, None, allowed)
+		ret = self.parse_loop(self.token_list, None, self.get_preamble_parsers())
 		unparsed = self.token_list.touch()
-		SpecDebug.debug("-- preamble finished with token '%s' on line %d" % (str(unparsed), unparsed.line))
+		SpecDebug.debug("-- preamble finished with token '%s' on %s" % (str(unparsed), unparsed.get_position_str()))
 		return ret
 
 	def parse_loop_section(self):
@@ -199,19 +333,143 @@ class SpecFileParser(SpecModelParser):
 		'''
 		return self.parse_loop(self.token_list, None, self.MANIPULATORS)
 
+	def parse_sections(self):
+		'''
+		Parse a spec file incrementally, sections are not added to the model
+		@return: top level sections, each is yielded as soon as it is parsed
+		@rtype: generator of L{SpecSection}
+		@raise SpecBadToken: when an unexpected token is reached
+		@note: tokens are lexed only as far as parsed, see L{SpecTokenList}
+		'''
+		for section in self.iter_loop(self.token_list, None, self.get_preamble_parsers()):
+			yield section
+
+		for section in self.iter_loop(self.token_list, None, self.MANIPULATORS):
+			yield section
+
+		eof = self.token_list.touch()
+		if not eof.is_eof():
+			raise SpecBadToken("Unexpected symbol '" + str(eof.token) + "' on " + eof.get_position_str())
+
+	def get_scan_limit(self, section_types):
+		'''
+		Find where the last section of given types may begin, the spec file
+		source is scanned for keywords of these sections
+		@param section_types: sections to be found
+		@type section_types: tuple of __class__
+		@return: offset in the spec file source, no section of given types
+		begins at or after the offset
+		@rtype: number
+		@note: keywords are looked for in the whole source including comments
+		and section bodies, the offset is never lower than it should be
+		'''
+		source = self.spec_file.content
+
+		keywords = [ k for k, (idx, parser, section) in self.keywords.iteritems() \
+						if issubclass(section, section_types) ]
+		pattern = re.compile('|'.join(re.escape(k) for k in keywords)) if keywords else None
+
+		# the last keyword is looked for from the end of the source, the
+		# scanned window is doubled until a keyword is found
+		size = 65536
+		while True:
+			begin = max(len(source) - size, 0)
+			ends = [ match.end() for match in pattern.finditer(source, begin) ] if pattern else []
+
+			for idx, parser, patterns, kinds in self.fallback:
+				parser_ends = parser.find_beginnings(source, begin, section_types)
+				if parser_ends is None:
+					return len(source)
+				ends += parser_ends
+
+			if ends or begin == 0:
+				return max(ends or [ 0 ])
+			size *= 2
+
+	def parse_partial(self, section_types):
+		'''
+		Parse a spec file only up to the last section of given types, the
+		rest of the file is kept in a L{SpecStTail} section and parsed on
+		L{parse_tail}
+		@param section_types: sections to be parsed, preamble is always parsed
+		@type section_types: tuple of __class__
+		@return: None
+		@rtype: None
+		@raise SpecBadToken: when an unexpected token is reached
+		@note: parse cache is not used, unexpected tokens in the tail are
+		reported by L{parse_tail}
+		'''
+		sections = self.parse_preamble()
+
+		limit = self.get_scan_limit(section_types)
+		loop = self.iter_loop(self.token_list, None, self.MANIPULATORS)
+
+		token = self.token_list.touch()
+		while not token.is_eof() and token.start < limit:
+			section = next(loop, None)
+			if section is None:
+				break
+			sections.append(section)
+			token = self.token_list.touch()
+
+		if not token.is_eof():
+			if token.start < limit:
+				raise SpecBadToken("Unexpected symbol '" + str(token.token) + "' on " + token.get_position_str())
+
+			SpecDebug.debug("-- parsing stopped with token '%s' on %s" % (str(token), token.get_position_str()))
+			self.tail = SpecStTail()
+			self.tail.set_tokens(self.token_list.get_remaining())
+			sections.append(self.tail)
+
+		self.get_model_writer().append_items(sections)
+
+	def parse_tail(self):
+		'''
+		Parse the rest of a spec file left by L{parse_partial}, the
+		L{SpecStTail} section is replaced by parsed sections
+		@return: None
+		@rtype: None
+		@raise SpecBadToken: when an unexpected token is reached
+		'''
+		if self.tail is None:
+			return
+
+		self.get_model_writer().remove(self.tail)
+		self.tail = None
+		self.get_model_writer().append_items(self.parse_loop_section())
+
+		eof = self.token_list.touch()
+		if not eof.is_eof():
+			raise SpecBadToken("Unexpected symbol '" + str(eof.token) + "' on " + eof.get_position_str())
+
 	def parse(self):
 		'''
 		Main parser entry point - parse provided spec file
 		@return: None
 		@rtype:
 		@raise SpecBadToken: when an unexpected token is reached
+		@note: if a parse cache is set, sections are loaded from the cache
+		when the spec file was already parsed
 		'''
-		self.get_model_writer().append_items(self.parse_preamble())
-		self.get_model_writer().append_items(self.parse_loop_section())
+		key = None
+		if self.cache is not None:
+			key = self.cache.get_key(self.spec_file.content, self.get_cache_salt())
+			sections = self.cache.load(key)
+			if sections is not None:
+				self.get_model_writer().append_items(sections)
+				return
+
+		sections = self.parse_preamble()
+		self.get_model_writer().append_items(sections)
+		loop_sections = self.parse_loop_section()
+		self.get_model_writer().append_items(loop_sections)
 
 		eof = self.token_list.touch()
 		if not eof.is_eof():
-			raise SpecBadToken("Unexpected symbol '" + str(eof.token) + "' on line " + str(eof.line))
+			raise SpecBadToken("Unexpected symbol '" + str(eof.token) + "' on " + eof.get_position_str())
+
+		if key is not None:
+			self.cache.store(key, sections + loop_sections)
 
 class SpecSectionParser(object):
 	'''
@@ -232,6 +490,82 @@ class SpecSectionParser(object):
 		'''
 		raise SpecNotImplemented("Cannot instantiate")
 
+	@classmethod
+	def get_keywords(cls):
+		'''
+		Get keywords which begin a section
+		@return: keywords and sections they begin
+		@rtype: dict
+		'''
+		return dict((str(o), o) for o in SpecSectionParser.obj)
+
+	@classmethod
+	def get_patterns(cls):
+		'''
+		Get compiled patterns matching keywords which begin a section, used
+		when keywords cannot be listed
+		@return: patterns
+		@rtype: list of compiled patterns
+		'''
+		return []
+
+	@classmethod
+	def get_pattern_kinds(cls):
+		'''
+		Get token kinds matched by L{get_patterns}
+		@return: token kinds or None if patterns can match any token
+		@rtype: list of L{SpecTokenKind} codes
+		'''
+		return None
+
+	@classmethod
+	def get_dispatch_keywords(cls):
+		'''
+		Get keywords for parser dispatch table
+		@return: keywords and sections they begin or None if section
+		beginning has to be checked using L{section_beginning}
+		@rtype: dict
+		'''
+		def defined_in(attr):
+			for idx, c in enumerate(cls.__mro__):
+				if attr in c.__dict__:
+					return idx
+
+		# a parser overriding section_beginning() but not get_keywords()
+		if defined_in('section_beginning') < defined_in('get_keywords'):
+			return None
+
+		return cls.get_keywords()
+
+	@classmethod
+	def find_beginnings(cls, source, begin, section_types):
+		'''
+		Find where sections of given types parsed by this parser may begin,
+		used for parsers which cannot state their keywords, see
+		L{SpecFileParser.get_scan_limit}
+		@param source: spec file source
+		@type source: string
+		@param begin: offset to search from
+		@type begin: number
+		@param section_types: sections to be found
+		@type section_types: tuple of __class__
+		@return: offsets after found section beginnings or None if sections
+		cannot be found in source
+		@rtype: list of numbers
+		'''
+		return None
+
+	@classmethod
+	def section_beginning_in_body(cls, token_list):
+		'''
+		Check if a section found by L{section_beginning} ends a section body
+		@param token_list: token list to use
+		@type token_list: L{SpecTokenList}
+		@return: True if the section ends a section body
+		@rtype: Boolean
+		'''
+		return True
+
 	@staticmethod
 	def section_beginning(token_list):
 		'''
@@ -281,6 +615,15 @@ class SpecExpressionParser(SpecSectionParser):
 	'''
 	obj = SpecStExpression
 
+	@classmethod
+	def get_keywords(cls):
+		'''
+		Get keywords which begin a section
+		@return: keywords and sections they begin
+		@rtype: dict
+		'''
+		return {}
+
 	@staticmethod
 	def section_beginning(token_list):
 		'''
@@ -311,18 +654,14 @@ class SpecExpressionParser(SpecSectionParser):
 
 		tokens = SpecTokenList()
 		# let's assume, that the very first token is a part of an expression
-		if str(token_list.touch()) == '!':
+		if token_list.touch_kind() == SpecTokenKind.OPERATOR and str(token_list.touch()) == '!':
 			tokens.token_list_append(token_list.get())
 			tokens.token_list_append(token_list.get())
 		else:
 			tokens.token_list_append(token_list.get())
 
 		while True:
-			tkn = token_list.touch()
-			if str(tkn) == '>=' or str(tkn) == '<=' \
-					or str(tkn) == '<' or str(tkn) == '>' \
-					or str(tkn) == '!=' or str(tkn) == '==' \
-					or str(tkn) == '&&' or str(tkn) == '||' or str(tkn) == '!':
+			if token_list.touch_kind() == SpecTokenKind.OPERATOR:
 				tokens.token_list_append(token_list.get())
 				if token_list.touch().is_eof():
 					raise SpecBadToken("Unexpected EOF, expected expression termination")
@@ -340,6 +679,15 @@ class SpecIfParser(SpecSectionParser):
 	'''
 	obj = SpecStIf
 
+	@classmethod
+	def get_keywords(cls):
+		'''
+		Get keywords which begin a section
+		@return: keywords and sections they begin
+		@rtype: dict
+		'''
+		return { '%if': SpecIfParser.obj, '%ifarch': SpecIfParser.obj }
+
 	@staticmethod
 	def section_beginning(token_list):
 		'''
@@ -349,6 +697,9 @@ class SpecIfParser(SpecSectionParser):
 		@return: None or a parser to be used to parse the section
 		@rtype: L{SpecSectionParser}
 		'''
+		if token_list.touch_kind() != SpecTokenKind.CONDITIONAL:
+			return None
+
 		token = token_list.touch()
 		if str(token) == '%if' or str(token) == '%ifarch':
 			return SpecIfParser.obj
@@ -388,8 +739,8 @@ class SpecIfParser(SpecSectionParser):
 
 		if str(token) != '%endif':
 			token_list.set_pointer(pointer)
-			raise SpecBadToken("Unexpected token '%s' on line '%s', expected 'endif'"
-					% (str(token), str(token.get_line())))
+			raise SpecBadToken("Unexpected token '%s' on %s, expected 'endif'"
+					% (str(token), token.get_position_str()))
 
 		stif.set_endif_token(token_list.get())
 		return stif
@@ -401,6 +752,15 @@ class SpecTagParser(SpecSectionParser):
 	'''
 	obj = SpecStTag
 
+	@classmethod
+	def get_keywords(cls):
+		'''
+		Get keywords which begin a section
+		@return: keywords and sections they begin
+		@rtype: dict
+		'''
+		return { '%license': SpecTagParser.obj, '%doc': SpecTagParser.obj }
+
 	@staticmethod
 	def section_beginning(token_list):
 		'''
@@ -444,11 +804,134 @@ class SpecTagParser(SpecSectionParser):
 class SpecDefinitionParser(SpecSectionParser):
 	'''
 	Parse a definition
+	@cvar TAGS: patterns of definition tags (without colon), tags are matched
+	case insensitive, optionally prefixed with conditional macros (e.g.
+	'%{?scl_prefix}') and followed by a qualifier (e.g. 'Requires(post):');
+	a custom parser can extend the list to recognize new tags
+	@cvar BODY_TAGS: pattern of tags which end a section body, matched case
+	sensitive so a text in a section body is not taken as a definition
+	@cvar BODY_TAGS_LINE: L{BODY_TAGS} at a line beginning, used to scan the
+	source, see L{find_beginnings}
+	@cvar SECTIONS_LINE: pattern of keywords of %package and sections with a
+	body at a line beginning, definitions in L{TAGS} are looked for only
+	before a section body
 	'''
 	obj = SpecStDefinition
 
-	@staticmethod
-	def section_beginning(token_list):
+	TAGS = [ 'Name', 'Version', 'Release', 'Epoch', 'Serial', 'Summary', 'License',
+				'Copyright', 'Group', 'URL', 'BugURL', 'Packager', 'Vendor', 'Distribution',
+				'DistTag', 'ModularityLabel', 'VCS', 'Icon', 'Source[0-9]*', 'Patch[0-9]*',
+				'NoSource', 'NoPatch', 'BuildRoot', 'BuildArch', 'BuildArchitectures',
+				'ExclusiveArch', 'ExcludeArch', 'ExclusiveOS', 'ExcludeOS', 'Prefix',
+				'Prefixes', 'DocDir', 'RemovePathPostfixes', 'AutoReq', 'AutoProv',
+				'AutoReqProv', 'Requires', 'BuildRequires', 'PreReq', 'BuildPreReq',
+				'OrderWithRequires', 'Provides', 'Conflicts', 'BuildConflicts', 'Obsoletes',
+				'Recommends', 'Suggests', 'Supplements', 'Enhances' ]
+
+	BODY_TAGS = re.compile(r'(?:Name|Version|Release|Summary|License|URL|ExclusiveArch|BuildRequires|'
+				r'Provides|Requires|Source|BuildArch|Group|Url|Conflicts|Obsoletes|BuildRoot):\Z|'
+				r'(?:BuildRequires|Requires|Provides).*:|(?:Source|Patch)[0-9]+:')
+
+	BODY_TAGS_LINE = re.compile(r'^[ \t]*(?:(?:Name|Version|Release|Summary|License|URL|ExclusiveArch|'
+				r'BuildRequires|Provides|Requires|Source|BuildArch|Group|Url|Conflicts|Obsoletes|'
+				r'BuildRoot):|(?:BuildRequires|Requires|Provides)\S*:|(?:Source|Patch)[0-9]+:)', re.MULTILINE)
+
+	SECTIONS_LINE = re.compile(r'^[ \t]*%(package|description|prep|build|install|check|clean|files|'
+				r'changelog|pre|post|preun|postun|pretrans|posttrans|trigger|triggerin|triggerprein|'
+				r'triggerun|triggerpostun|verifyscript)(?![\w-])', re.MULTILINE)
+
+	@classmethod
+	def get_matcher(cls):
+		'''
+		Get compiled pattern matching a whole token of a tag in L{TAGS}, the
+		pattern is compiled once per parser class
+		@return: compiled pattern
+		@rtype: compiled pattern
+		'''
+		matcher = cls.__dict__.get('_matcher')
+		if matcher is None:
+			matcher = re.compile(r'(?:%%\{\?[^}]*\})*(?:%s)(?:\([^)]*\))?:\Z' % '|'.join(cls.TAGS),
+								re.IGNORECASE)
+			cls._matcher = matcher
+		return matcher
+
+	@classmethod
+	def get_line_matcher(cls):
+		'''
+		Get compiled pattern matching a tag in L{TAGS} at a line beginning,
+		the pattern is compiled once per parser class
+		@return: compiled pattern
+		@rtype: compiled pattern
+		'''
+		matcher = cls.__dict__.get('_line_matcher')
+		if matcher is None:
+			matcher = re.compile(r'^[ \t]*(?:%%\{\?[^}]*\})*(?:%s)(?:\([^)]*\))?:' % '|'.join(cls.TAGS),
+								re.IGNORECASE | re.MULTILINE)
+			cls._line_matcher = matcher
+		return matcher
+
+	@classmethod
+	def get_keywords(cls):
+		'''
+		Get keywords which begin a section
+		@return: keywords and sections they begin
+		@rtype: dict
+		'''
+		return {} # tags are matched by a pattern
+
+	@classmethod
+	def get_patterns(cls):
+		'''
+		Get compiled patterns matching keywords which begin a section
+		@return: patterns
+		@rtype: list of compiled patterns
+		'''
+		return [ cls.get_matcher(), cls.BODY_TAGS ]
+
+	@classmethod
+	def get_pattern_kinds(cls):
+		'''
+		Get token kinds matched by L{get_patterns}
+		@return: token kinds
+		@rtype: list of L{SpecTokenKind} codes
+		'''
+		return [ SpecTokenKind.DEFINITION ]
+
+	@classmethod
+	def find_beginnings(cls, source, begin, section_types):
+		'''
+		Find where definitions may begin - tags in L{TAGS} are looked for at
+		line beginnings of the last %package (or the main preamble if there is
+		none) up to the next section body, L{BODY_TAGS} at line beginnings of
+		the whole source
+		@param source: spec file source
+		@type source: string
+		@param begin: offset to search from
+		@type begin: number
+		@param section_types: sections to be found
+		@type section_types: tuple of __class__
+		@return: offsets after found tags
+		@rtype: list of numbers
+		@note: source before begin is not known, a preamble is assumed to
+		extend up to the first section body found
+		'''
+		if not issubclass(cls.obj, section_types):
+			return []
+
+		# the last preamble, ends before the section body following it
+		start, end = begin, None
+		for match in cls.SECTIONS_LINE.finditer(source, begin):
+			if match.group(1) == 'package':
+				start, end = match.end(), None
+			elif end is None:
+				end = match.start()
+
+		ret = [ match.end() for match in cls.get_line_matcher().finditer(source, start,
+																len(source) if end is None else end) ]
+		return ret + [ match.end() for match in cls.BODY_TAGS_LINE.finditer(source, begin) ]
+
+	@classmethod
+	def section_beginning(cls, token_list):
 		'''
 		Check if next token is a section beginning
 		@param token_list: token list to use
@@ -456,36 +939,27 @@ class SpecDefinitionParser(SpecSectionParser):
 		@return: None or a parser to be used to parse the section
 		@rtype: L{SpecSectionParser}
 		'''
-		token = token_list.touch()
-
-		if str(token) in [ 'Name:', 'Version:', 'Release:', 'Summary:', 'License:',
-				'URL:', 'ExclusiveArch:', 'BuildRequires:', 'Provides:', 'Requires:',
-				'Source:', 'BuildArch:', 'Group:', 'Url:', 'Conflicts:', 'Obsoletes:',
-				'BuildRoot:' ]:
-			return SpecDefinitionParser.obj
-
-		p = re.compile('BuildRequires(.*):') # This could be adjusted later on
-		if p.match(str(token)):
-			return SpecDefinitionParser.obj
-
-		p = re.compile('Requires(.*):') # This could be adjusted later on
-		if p.match(str(token)):
-			return SpecDefinitionParser.obj
+		if token_list.touch_kind() != SpecTokenKind.DEFINITION:
+			return None
 
-		p = re.compile('Provides(.*):') # This could be adjusted later on
-		if p.match(str(token)):
+		token = str(token_list.touch())
+		if cls.get_matcher().match(token) or cls.BODY_TAGS.match(token):
 			return SpecDefinitionParser.obj
 
-		p = re.compile('Source[0-9]+:')
-		if p.match(str(token)):
-				return SpecDefinitionParser.obj
-
-		p = re.compile('Patch[0-9]+:')
-		if p.match(str(token)):
-				return SpecDefinitionParser.obj
-
 		return None
 
+	@classmethod
+	def section_beginning_in_body(cls, token_list):
+		'''
+		Check if a definition found by L{section_beginning} ends a section
+		body, only tags in L{BODY_TAGS} do
+		@param token_list: token list to use
+		@type token_list: L{SpecTokenList}
+		@return: True if the definition ends a section body
+		@rtype: Boolean
+		'''
+		return cls.BODY_TAGS.match(str(token_list.touch())) is not None
+
 	@classmethod
 	def parse(cls, token_list, parent, allowed, ctx):
 		'''
@@ -518,6 +992,15 @@ class SpecGlobalParser(SpecSectionParser):
 	'''
 	obj = SpecStGlobal
 
+	@classmethod
+	def get_keywords(cls):
+		'''
+		Get keywords which begin a section
+		@return: keywords and sections they begin
+		@rtype: dict
+		'''
+		return { str(SpecGlobalParser.obj): SpecGlobalParser.obj }
+
 	@staticmethod
 	def section_beginning(token_list):
 		'''
@@ -555,7 +1038,7 @@ class SpecGlobalParser(SpecSectionParser):
 		ret.set_global_token(token_list.get())
 		ret.set_variable(token_list.get())
 		if ret.get_variable().is_eof():
-			raise SpecBedToken("Expected variable, got '%s'" % str(ret.get_variable()))
+			raise SpecBadToken("Expected variable, got '%s'" % str(ret.get_variable()))
 
 		ret.set_value(token_list.get_line())
 		return ret
@@ -566,6 +1049,15 @@ class SpecDefineParser(SpecSectionParser):
 	'''
 	obj = SpecStDefine
 
+	@classmethod
+	def get_keywords(cls):
+		'''
+		Get keywords which begin a section
+		@return: keywords and sections they begin
+		@rtype: dict
+		'''
+		return { str(SpecDefineParser.obj): SpecGlobalParser.obj }
+
 	@staticmethod
 	def section_beginning(token_list):
 		'''
@@ -603,7 +1095,7 @@ class SpecDefineParser(SpecSectionParser):
 		ret.set_define_token(token_list.get())
 		ret.set_variable(token_list.get())
 		if ret.get_variable().is_eof():
-			raise SpecBedToken("Expected variable, got '%s'" % str(ret.get_variable()))
+			raise SpecBadToken("Expected variable, got '%s'" % str(ret.get_variable()))
 
 		ret.set_value(token_list.get_line())
 		return ret
@@ -620,6 +1112,15 @@ class SpecChangelogParser(SpecSectionParser):
 	'''
 	obj = SpecStChangelog
 
+	@classmethod
+	def get_keywords(cls):
+		'''
+		Get keywords which begin a section
+		@return: keywords and sections they begin
+		@rtype: dict
+		'''
+		return { str(SpecChangelogParser.obj): SpecChangelogParser.obj }
+
 	@staticmethod
 	def section_beginning(token_list):
 		'''
@@ -666,14 +1167,14 @@ class SpecChangelogParser(SpecSectionParser):
 				return True
 
 			# or is there another changelog entry?
-			return str(token_list.touch()) == '*'
+			return tkn.get_kind() == SpecTokenKind.WORD and str(tkn) == '*'
 
 		entry = SpecChangelogParser.obj.SpecStChangelogEntry(parent)
 
 		star = token_list.get()
 		if str(star) != '*':
 			token_list.unget()
-			raise SpecBadToken("Expected token '*', got '%s'" % star)
+			raise SpecBadToken("Expected token '*', got '%s' on %s" % (star, star.get_position_str()))
 		entry.set_star(star)
 
 		date = SpecTokenList()
@@ -770,6 +1271,15 @@ class SpecPackageParser(SpecSectionParser):
 	'''
 	obj = SpecStPackage
 
+	@classmethod
+	def get_keywords(cls):
+		'''
+		Get keywords which begin a section
+		@return: keywords and sections they begin
+		@rtype: dict
+		'''
+		return { str(SpecPackageParser.obj): SpecPackageParser.obj }
+
 	@staticmethod
 	def section_beginning(token_list):
 		'''
@@ -28,17 +28,69 @@ A spec model rendering
 import re
 import sys
 import cStringIO
+from contextlib import contextmanager
 from specDebug import SpecDebug
 from specError import SpecNotFound, SpecNotImplemented
 from specModelRenderer import SpecModelRenderer
 from specSection import *
 
+class SpecChunkBuffer(object):
+	'''
+	A file-like object collecting written chunks in memory
+	'''
+	def __init__(self):
+		'''
+		Init L{SpecChunkBuffer}
+		@return: None
+		@rtype: None
+		'''
+		self.chunks = []
+		self.write = self.chunks.append
+
+	def writelines(self, chunks):
+		'''
+		Write multiple chunks
+		@param chunks: chunks to be written
+		@type chunks: list of strings
+		@return: None
+		@rtype: None
+		'''
+		self.chunks.extend(chunks)
+
+	def getvalue(self):
+		'''
+		Get written chunks
+		@return: chunks joined
+		@rtype: string
+		'''
+		return ''.join(self.chunks)
+
+	def flush_to(self, f):
+		'''
+		Write collected chunks to a file at once and forget them
+		@param f: a file to write to
+		@type f: file
+		@return: None
+		@rtype: None
+		'''
+		if self.chunks:
+			f.write(''.join(self.chunks))
+			del self.chunks[:]
+
 class SpecFileRenderer(SpecModelRenderer):
 	'''
 	A spec renderer
+	@note: sections which were not modified since parsed are written from the
+	parsed source text unless a custom section renderer is registered
+	@note: output is collected in memory and written to a file at once when
+	rendering finishes, unless buffering is turned off
 	'''
 	def __init__(self, reader):
 		self.set_model_reader(reader)
+		self.passthrough = True
+		self.buffering = True
+		# section class -> renderer functions, see get_renderers()
+		self.renderers = {}
 		self.MANIPULATORS = [
 				SpecIfRenderer,
 				SpecTagRenderer,
@@ -65,12 +117,57 @@ class SpecFileRenderer(SpecModelRenderer):
 				SpecTriggerpreinRenderer,
 				SpecTriggerunRenderer,
 				SpecTriggerpostunRenderer,
-				SpecVerifyscriptRenderer
+				SpecVerifyscriptRenderer,
+				SpecTailRenderer
 			]
 
+	def register(self, manipulator):
+		'''
+		Register a section renderer, sections are no longer written from their
+		source text so the renderer is used for all sections
+		@param manipulator: a renderer to be registered
+		@type manipulator: L{SpecSectionRenderer}
+		@return: None
+		@rtype: None
+		@raise SpecNotFound: if provided renderer cannot be registered
+		'''
+		SpecModelRenderer.register(self, manipulator)
+		self.passthrough = False
+		self.renderers = {}
+
+	def get_renderers(self, cls):
+		'''
+		Get renderers of a section class, all registered renderers the section
+		class matches are used in order of registration; renderers are looked
+		up once per section class
+		@param cls: section class
+		@type cls: __class__
+		@return: functions rendering a section, called with the section, a file
+		and a rendering context
+		@rtype: list of functions
+		@raise SpecNotImplemented: if renderer for the section is not registered
+		@note: a renderer instance is reused for all sections unless the
+		renderer overrides L{SpecSectionRenderer.render}, see
+		L{SpecSectionRenderer.is_reusable}
+		'''
+		ret = self.renderers.get(cls)
+		if ret is None:
+			ret = []
+			for renderer in self.MANIPULATORS:
+				if issubclass(cls, renderer.obj):
+					if renderer.is_reusable():
+						ret.append(renderer(None).render_section)
+					else:
+						ret.append(lambda section, f, ctx, renderer = renderer: renderer(section).render(f, ctx))
+			if not ret:
+				raise SpecNotImplemented("Not implemented renderer")
+			self.renderers[cls] = ret
+		return ret
+
 	def render_list(self, l, f):
 		'''
-		Render a list of sections
+		Render a list of sections, source text of adjacent unmodified sections
+		is written at once
 		@param l: a list to be rendered
 		@type l: list of L{SpecSection}
 		@param f: a file to render to
@@ -78,8 +175,46 @@ class SpecFileRenderer(SpecModelRenderer):
 		@return: None
 		@rtype: None
 		'''
+		if not self.passthrough:
+			for section in l:
+				self.render_section(section, f)
+			return
+
+		span = None # source text not written yet
 		for section in l:
-			self.render_section(section, f)
+			s = section.get_span()
+			if s is not None and span is not None and s[0] is span[0] and s[1] == span[2]:
+				span = (span[0], span[1], s[2])
+				continue
+
+			if span is not None:
+				f.write(span[0].source[span[1]:span[2]])
+			span = s
+			if span is None:
+				self.render_section(section, f)
+
+		if span is not None:
+			f.write(span[0].source[span[1]:span[2]])
+
+	@contextmanager
+	def buffered(self, f):
+		'''
+		Collect output written within a with block and write it to a file at
+		once when the block is left; nested blocks join the outer one
+		@param f: a file to render to
+		@type f: file
+		@return: context manager providing a file to render to
+		@rtype: context manager
+		'''
+		if not self.buffering or isinstance(f, SpecChunkBuffer):
+			yield f
+			return
+
+		buf = SpecChunkBuffer()
+		try:
+			yield buf
+		finally:
+			buf.flush_to(f)
 
 	def render(self, f):
 		'''
@@ -89,7 +224,38 @@ class SpecFileRenderer(SpecModelRenderer):
 		@return: None
 		@rtype: None
 		'''
-		self.render_list(self.get_model_reader().get_sections(), f)
+		with self.buffered(f) as f:
+			self.render_list(self.get_model_reader().get_sections(), f)
+
+	def render_chunks(self):
+		'''
+		Render whole model section by section
+		@return: chunks of the rendered model, in order
+		@rtype: generator of strings
+		'''
+		buf = SpecChunkBuffer()
+		for section in self.get_model_reader().get_sections():
+			self.render_list([ section ], buf)
+			for chunk in buf.chunks:
+				yield chunk
+			del buf.chunks[:]
+
+	def render_stream(self, sections, f):
+		'''
+		Render sections as they come, sections do not need to be in the model
+		@param sections: sections to be rendered
+		@type sections: iterable of L{SpecSection}
+		@param f: a file to render to
+		@type f: file
+		@return: None
+		@rtype: None
+		@note: only one section is held in memory at a time if sections are
+		generated, see L{SpecFileParser.parse_sections}
+		@note: sections rendered before a parse error are already written to f
+		'''
+		for section in sections:
+			with self.buffered(f) as out:
+				self.render_list([ section ], out)
 
 	def render_section(self, s, f):
 		'''
@@ -102,14 +268,14 @@ class SpecFileRenderer(SpecModelRenderer):
 		@rtype: None
 		@raise SpecNotImplemented: if renderer for the section is not registered
 		'''
-		found = False
-		for renderer in self.MANIPULATORS:
-			if issubclass(s.__class__, renderer.obj):
-				found = True
-				SpecDebug.debug("- rendering section '%s'" % type(s))
-				renderer(s).render(f, self)
-		if not found:
-			raise SpecNotImplemented("Not implemented renderer")
+		span = s.get_span()
+		if span is not None and self.passthrough:
+			f.write(span[0].source[span[1]:span[2]])
+			return
+
+		SpecDebug.debug("- rendering section '%s'" % type(s))
+		for render in self.get_renderers(s.__class__):
+			render(s, f, self)
 
 	def find_section_print(self, section_type, f = sys.stdout, verbose = True):
 		'''
@@ -127,13 +293,31 @@ class SpecFileRenderer(SpecModelRenderer):
 		s = self.get_model_reader().find_section(section_type)
 
 		if s is not None:
-			for sec in s:
-				self.render_section(sec, f)
+			with self.buffered(f) as f:
+				for sec in s:
+					self.render_section(sec, f)
 		elif verbose:
 			raise SpecNotFound("Error: section '%s' not found" % section_type)
 
 		return s
 
+	def find_definitions(self, name, packages):
+		'''
+		Find definitions of a name in packages
+		@param name: definition name e.g. 'Provides:'
+		@type name: string
+		@param packages: packages definitions should be found in, '-' for main
+		package, '*' for all packages
+		@type packages: list of strings
+		@return: found definitions
+		@rtype: list of L{SpecStDefinition}
+		'''
+		if '*' in packages:
+			return self.get_model_reader().find_definitions(name)
+
+		return self.get_model_reader().find_definitions(name,
+								[ None if pkg == '-' else pkg for pkg in packages ])
+
 	def print_definitions(self, defs, definition, packages, f):
 		'''
 		Find a definition and print/render it
@@ -148,20 +332,21 @@ class SpecFileRenderer(SpecModelRenderer):
 		@return: None
 		@rtype: None
 		'''
-		for d in defs:
-			if definition.match(str(d.name)):
-				pkg = d.get_package()
-				if pkg:
-					pkg = pkg.get_package()
-				if str(pkg) in packages or (pkg is None and '-' in packages) or '*' in packages:
-					if pkg is None:
-						f.write('-:')
-					else:
-						pkg.write(f, raw = True)
-						f.write(':') # add delim since raw
-
-					d.get_value().write(f, raw = True)
-					f.write('\n') # Add delim since raw token is printed
+		with self.buffered(f) as f:
+			for d in defs:
+				if definition.match(str(d.name)):
+					pkg = d.get_package()
+					if pkg:
+						pkg = pkg.get_package()
+					if str(pkg) in packages or (pkg is None and '-' in packages) or '*' in packages:
+						if pkg is None:
+							f.write('-:')
+						else:
+							pkg.write(f, raw = True)
+							f.write(':') # add delim since raw
+
+						d.get_value().write(f, raw = True)
+						f.write('\n') # Add delim since raw token is printed
 
 	def provides_show(self, packages, f = sys.stdout):
 		'''
@@ -173,8 +358,8 @@ class SpecFileRenderer(SpecModelRenderer):
 		@return: None
 		@rtype: None
 		'''
-		defs = self.get_model_reader().find_definitions_all()
-		self.print_definitions(defs, re.compile('Provides:'), packages, f)
+		defs = self.find_definitions('Provides:', packages)
+		self.print_definitions(defs, re.compile('Provides:', re.IGNORECASE), packages, f)
 
 	def requires_show(self, packages, f = sys.stdout):
 		'''
@@ -186,8 +371,8 @@ class SpecFileRenderer(SpecModelRenderer):
 		@return: None
 		@rtype: None
 		'''
-		defs = self.get_model_reader().find_definitions_all()
-		self.print_definitions(defs, re.compile('Requires:'), packages, f)
+		defs = self.find_definitions('Requires:', packages)
+		self.print_definitions(defs, re.compile('Requires:', re.IGNORECASE), packages, f)
 
 	def buildrequires_show(self, packages, f = sys.stdout):
 		'''
@@ -199,8 +384,8 @@ class SpecFileRenderer(SpecModelRenderer):
 		@return: None
 		@rtype: None
 		'''
-		defs = self.get_model_reader().find_definitions_all()
-		self.print_definitions(defs, re.compile('BuildRequires:'), packages, f)
+		defs = self.find_definitions('BuildRequires:', packages)
+		self.print_definitions(defs, re.compile('BuildRequires:', re.IGNORECASE), packages, f)
 
 	def changelog_show(self, f = sys.stdout):
 		'''
@@ -212,18 +397,49 @@ class SpecFileRenderer(SpecModelRenderer):
 		'''
 		return self.find_section_print(SpecStChangelog, f)
 
-	def description_show(self, packages = None, f = sys.stdout):
+	def find_package_section_print(self, section_type, packages, f, verbose = True):
+		'''
+		Find sections of packages and print/render them
+		@param section_type: section type to look for
+		@type section_type: __class__
+		@param packages: packages to print sections of, '-' for main package
+		@type packages: list of strings
+		@param f: a file to render to
+		@type f: file
+		@param verbose: if true, raise an exception if a section is not found
+		@type verbose: Boolean
+		@return: list of sections which were printed
+		@rtype: list of L{SpecSection}
+		@raise SpecNotFound: if no section was printed
+		'''
+		ret = []
+		with self.buffered(f) as f:
+			for pkg in packages:
+				s = self.get_model_reader().find_package_sections(pkg, section_type)
+				if s is not None:
+					for sec in s:
+						self.render_section(sec, f)
+					ret += s
+
+		if not ret and verbose:
+			raise SpecNotFound("Error: section '%s' not found" % section_type)
+
+		return ret or None
+
+	def description_show(self, f = sys.stdout, packages = None):
 		'''
 		Show description section
-		@param packages: a file to render to
-		@type packages: file
 		@param f: a file to render to
 		@type f: file
+		@param packages: packages to show description of, '-' for main
+		package, all if None
+		@type packages: list of strings
 		@return: None
 		@rtype: None
 		'''
-		# TODO: do this for a specific package
-		return self.find_section_print(SpecStDescription, f)
+		if packages is None:
+			return self.find_section_print(SpecStDescription, f)
+		return self.find_package_section_print(SpecStDescription, packages, f)
 
 	def build_show(self, f = sys.stdout):
 		'''
@@ -255,15 +471,20 @@ class SpecFileRenderer(SpecModelRenderer):
 		'''
 		return self.find_section_print(SpecStClean, f)
 
-	def files_show(self, f = sys.stdout):
+	def files_show(self, f = sys.stdout, packages = None):
 		'''
 		Show files section
 		@param f: a file to render to
 		@type f: file
+		@param packages: packages to show files of, '-' for main package, all
+		if None
+		@type packages: list of strings
 		@return: None
 		@rtype: None
 		'''
-		self.find_section_print(SpecStFiles, f)
+		if packages is None:
+			return self.find_section_print(SpecStFiles, f)
+		return self.find_package_section_print(SpecStFiles, packages, f)
 
 	def install_show(self, f = sys.stdout):
 		'''
@@ -275,16 +496,19 @@ class SpecFileRenderer(SpecModelRenderer):
 		'''
 		return self.find_section_print(SpecStInstall, f)
 
-	def package_show(self, f = sys.stdout):
+	def package_show(self, f = sys.stdout, packages = None):
 		'''
 		Show package section
 		@param f: a file to render to
 		@type f: file
+		@param packages: packages to show, all if None
+		@type packages: list of strings
 		@return: None
 		@rtype: None
 		'''
-		# TODO: do this for specific packages
-		return self.find_section_print(SpecStPackage, f)
+		if packages is None:
+			return self.find_section_print(SpecStPackage, f)
+		return self.find_package_section_print(SpecStPackage, packages, f)
 
 	def prep_show(self, f = sys.stdout):
 		'''
@@ -424,8 +648,22 @@ class SpecSectionRenderer(object):
 		self.section = section
 
 	def render(self, f, ctx):
+		'''
+		Render section passed on init
+		@param f: a file to render to
+		@type f: file
+		@param ctx: a rendering context
+		@type ctx: L{SpecModelRenderer}
+		@return: None
+		@rtype: None
+		'''
+		self.render_section(self.section, f, ctx)
+
+	def render_section(self, section, f, ctx):
 		'''
 		Render section
+		@param section: section to be rendered
+		@type section: L{SpecSection}
 		@param f: a file to render to
 		@type f: file
 		@param ctx: a rendering context
@@ -433,8 +671,23 @@ class SpecSectionRenderer(object):
 		@return: None
 		@rtype: None
 		'''
-		self.section.get_token_section().write(f)
-		self.section.get_tokens().write(f)
+		section.get_token_section().write(f)
+		section.get_tokens().write(f)
+
+	@classmethod
+	def is_reusable(cls):
+		'''
+		Check whether one renderer instance can render all sections, that is
+		the renderer does not override L{render} to render L{section}
+		@return: True if L{render_section} can be used
+		@rtype: Boolean
+		'''
+		def defined_in(attr):
+			for idx, c in enumerate(cls.__mro__):
+				if attr in c.__dict__:
+					return idx
+
+		return defined_in('render_section') <= defined_in('render')
 
 	def raw_string(self, ctx):
 		'''
@@ -487,9 +740,11 @@ class SpecIfRenderer(SpecSectionRenderer):
 	'''
 	obj = SpecStIf
 
-	def render(self, f, ctx):
+	def render_section(self, section, f, ctx):
 		'''
 		Render section
+		@param section: section to be rendered
+		@type section: L{SpecSection}
 		@param f: a file to render to
 		@type f: file
 		@param ctx: a rendering context
@@ -497,13 +752,13 @@ class SpecIfRenderer(SpecSectionRenderer):
 		@return: None
 		@rtype: None
 		'''
-		self.section.get_if_token().write(f)
-		SpecExpressionRenderer(self.section.get_expr()).render(f, ctx)
-		ctx.render_list(self.section.get_true_branch(), f)
-		if self.section.get_else_token():
-			self.section.get_else_token().write(f)
-			ctx.render_list(self.section.get_false_branch(), f)
-		self.section.get_endif_token().write(f)
+		section.get_if_token().write(f)
+		SpecExpressionRenderer(section.get_expr()).render(f, ctx)
+		ctx.render_list(section.get_true_branch(), f)
+		if section.get_else_token():
+			section.get_else_token().write(f)
+			ctx.render_list(section.get_false_branch(), f)
+		section.get_endif_token().write(f)
 
 class SpecGlobalRenderer(SpecSectionRenderer):
 	'''
@@ -512,9 +767,11 @@ class SpecGlobalRenderer(SpecSectionRenderer):
 	'''
 	obj = SpecStGlobal
 
-	def render(self, f, ctx):
+	def render_section(self, section, f, ctx):
 		'''
 		Render section
+		@param section: section to be rendered
+		@type section: L{SpecSection}
 		@param f: a file to render to
 		@type f: file
 		@param ctx: a rendering context
@@ -522,9 +779,9 @@ class SpecGlobalRenderer(SpecSectionRenderer):
 		@return: None
 		@rtype: None
 		'''
-		self.section.get_global_token().write(f)
-		self.section.get_variable().write(f)
-		self.section.get_value().write(f)
+		section.get_global_token().write(f)
+		section.get_variable().write(f)
+		section.get_value().write(f)
 
 class SpecDefineRenderer(SpecSectionRenderer):
 	'''
@@ -533,9 +790,11 @@ class SpecDefineRenderer(SpecSectionRenderer):
 	'''
 	obj = SpecStDefine
 
-	def render(self, f, ctx):
+	def render_section(self, section, f, ctx):
 		'''
 		Render section
+		@param section: section to be rendered
+		@type section: L{SpecSection}
 		@param f: a file to render to
 		@type f: file
 		@param ctx: a rendering context
@@ -543,9 +802,9 @@ class SpecDefineRenderer(SpecSectionRenderer):
 		@return: None
 		@rtype: None
 		'''
-		self.section.get_define_token().write(f)
-		self.section.get_variable().write(f)
-		self.section.get_value().write(f)
+		section.get_define_token().write(f)
+		section.get_variable().write(f)
+		section.get_value().write(f)
 
 class SpecBuildRenderer(SpecSectionRenderer):
 	'''
@@ -561,9 +820,11 @@ class SpecChangelogRenderer(SpecSectionRenderer):
 	'''
 	obj = SpecStChangelog
 
-	def render(self, f, ctx):
+	def render_section(self, section, f, ctx):
 		'''
 		Render section
+		@param section: section to be rendered
+		@type section: L{SpecSection}
 		@param f: a file to render to
 		@type f: file
 		@param ctx: a rendering context
@@ -571,9 +832,9 @@ class SpecChangelogRenderer(SpecSectionRenderer):
 		@return: None
 		@rtype: None
 		'''
-		self.section.get_token_section().write(f)
+		section.get_token_section().write(f)
 
-		for entry in self.section.get_entries():
+		for entry in section.get_entries():
 			entry.get_star().write(f)
 			entry.get_date().write(f)
 			entry.get_user().write(f)
@@ -625,9 +886,11 @@ class SpecPackageRenderer(SpecSectionRenderer):
 	'''
 	obj = SpecStPackage
 
-	def render(self, f, ctx):
+	def render_section(self, section, f, ctx):
 		'''
 		Render section
+		@param section: section to be rendered
+		@type section: L{SpecSection}
 		@param f: a file to render to
 		@type f: file
 		@param ctx: a rendering context
@@ -635,10 +898,10 @@ class SpecPackageRenderer(SpecSectionRenderer):
 		@return: None
 		@rtype: None
 		'''
-		self.section.get_token_section().write(f)
-		if self.section.get_package():
-			self.section.get_package().write(f)
-		ctx.render_list(self.section.get_defs(), f)
+		section.get_token_section().write(f)
+		if section.get_package():
+			section.get_package().write(f)
+		ctx.render_list(section.get_defs(), f)
 
 class SpecPrepRenderer(SpecSectionRenderer):
 	'''
@@ -696,9 +959,11 @@ class SpecTagRenderer(SpecSectionRenderer):
 	'''
 	obj = SpecStTag
 
-	def render(self, f, ctx):
+	def render_section(self, section, f, ctx):
 		'''
 		Render section
+		@param section: section to be rendered
+		@type section: L{SpecSection}
 		@param f: a file to render to
 		@type f: file
 		@param ctx: a rendering context
@@ -706,8 +971,8 @@ class SpecTagRenderer(SpecSectionRenderer):
 		@return: None
 		@rtype: None
 		'''
-		self.section.get_name().write(f)
-		self.section.get_value().write(f)
+		section.get_name().write(f)
+		section.get_value().write(f)
 
 class SpecDefinitionRenderer(SpecSectionRenderer):
 	'''
@@ -716,9 +981,11 @@ class SpecDefinitionRenderer(SpecSectionRenderer):
 	'''
 	obj = SpecStDefinition
 
-	def render(self, f, ctx):
+	def render_section(self, section, f, ctx):
 		'''
 		Render section
+		@param section: section to be rendered
+		@type section: L{SpecSection}
 		@param f: a file to render to
 		@type f: file
 		@param ctx: a rendering context
@@ -726,8 +993,8 @@ class SpecDefinitionRenderer(SpecSectionRenderer):
 		@return: None
 		@rtype: None
 		'''
-		self.section.get_name().write(f)
-		self.section.get_value().write(f)
+		section.get_name().write(f)
+		section.get_value().write(f)
 
 class SpecTriggerRenderer(SpecSectionRenderer):
 	'''
@@ -771,3 +1038,23 @@ class SpecVerifyscriptRenderer(SpecSectionRenderer):
 	'''
 	obj = SpecStVerifyscript
 
+class SpecTailRenderer(SpecSectionRenderer):
+	'''
+	Renderer of an unparsed rest of a spec file
+	@cvar obj: sections rendered by this renderer
+	'''
+	obj = SpecStTail
+
+	def render_section(self, section, f, ctx):
+		'''
+		Render section
+		@param section: section to be rendered
+		@type section: L{SpecSection}
+		@param f: a file to render to
+		@type f: file
+		@param ctx: a rendering context
+		@type ctx: L{SpecModelRenderer}
+		@return: None
+		@rtype: None
+		'''
+		section.get_tokens().write(f)
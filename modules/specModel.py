@@ -25,9 +25,11 @@ Basic operations on spec sections and spec section encapsulation
 @license: GPL 2.0
 '''
 
+import copy
+from collections import OrderedDict
 from specDebug import SpecDebug
 from specSection import *
-from specError import SpecNotImplemented, SpecNotFound
+from specError import SpecNotImplemented, SpecNotFound, SpecBadParam
 
 class SpecModel(object):
 	'''
@@ -62,6 +64,335 @@ class SpecModel(object):
 		'''
 		'''
 		self.sections = []
+		# section class -> sections of exactly that class in model order
+		self.section_index = {}
+		# queried type -> indexed classes which are its subclasses
+		self.section_types = {}
+		# definition name in lower case -> package name (None for main) -> definitions
+		self.definition_index = {}
+		# definition renames the definition index reflects, see index_renamed()
+		self.definition_renames = SpecStDefinition.renames
+		# definition -> (%if, is true branch) pairs the definition lives under
+		self.definition_context = {}
+		# package name as stated in %package -> %package section
+		self.package_index = {}
+		# package name as stated in section arguments (None for main) -> sections
+		self.package_sections = {}
+		# modifications collected in a transaction, see begin()
+		self.transaction = None
+		# sections list and indexes are shared with a fork, see fork()
+		self.shared = False
+		# top level sections copied since the last fork, None if not forked
+		self.owned = None
+		# sections shared with a fork -> their copies placed in the model
+		self.replaced = {}
+
+	def index_add(self, section):
+		'''
+		Add a section appended to the model to the section index
+		@param section: appended section
+		@type section: L{SpecSection}
+		@return: None
+		@rtype: None
+		'''
+		cls = section.__class__
+		if cls not in self.section_index:
+			self.section_index[cls] = []
+			self.section_types = {}
+		self.section_index[cls].append(section)
+		self.index_definitions(self.walk_definitions([section]))
+		self.index_packages(self.walk_packages([section]))
+
+	def index_classes(self, classes):
+		'''
+		Recompute index entries of section classes after sections of the
+		classes were placed in the middle of the model, package and definition
+		indexes are not updated
+		@param classes: section classes
+		@type classes: list of __class__
+		@return: None
+		@rtype: None
+		'''
+		for cls in classes:
+			if cls not in self.section_index:
+				self.section_types = {}
+			self.section_index[cls] = [ s for s in self.sections if s.__class__ is cls ]
+
+	def index_sections(self):
+		'''
+		Rebuild the section index from scratch, package and definition indexes
+		are not updated
+		@return: None
+		@rtype: None
+		'''
+		self.section_index = {}
+		self.section_types = {}
+		for section in self.sections:
+			self.section_index.setdefault(section.__class__, []).append(section)
+
+	def index_rebuild(self):
+		'''
+		Rebuild the section index from scratch
+		@return: None
+		@rtype: None
+		'''
+		self.index_sections()
+		self.definition_index = {}
+		self.definition_context = {}
+		self.definition_renames = SpecStDefinition.renames
+		self.package_index = {}
+		self.package_sections = {}
+		self.index_definitions(self.walk_definitions(self.sections))
+		self.index_packages(self.walk_packages(self.sections))
+
+	@staticmethod
+	def walk_sections(sections):
+		'''
+		Find sections including sections nested in %if branches and %package
+		@param sections: sections to search in
+		@type sections: list of L{SpecSection}
+		@return: sections, each followed by its nested sections
+		@rtype: list of L{SpecSection}
+		'''
+		ret = []
+		for s in sections:
+			ret.append(s)
+			if issubclass(s.__class__, SpecStIf):
+				ret += SpecModel.walk_sections(s.get_true_branch() or [])
+				ret += SpecModel.walk_sections(s.get_false_branch() or [])
+			elif issubclass(s.__class__, SpecStPackage):
+				ret += SpecModel.walk_sections(s.get_defs())
+		return ret
+
+	@staticmethod
+	def walk_packages(sections):
+		'''
+		Find sections which belong to a package, including %if branches
+		@param sections: sections to search in
+		@type sections: list of L{SpecSection}
+		@return: package names (None for main package) and sections, in model
+		order
+		@rtype: list of (string, L{SpecStSection})
+		'''
+		ret = []
+		for s in sections:
+			if issubclass(s.__class__, SpecStIf):
+				ret += SpecModel.walk_packages(s.get_true_branch() or [])
+				ret += SpecModel.walk_packages(s.get_false_branch() or [])
+			elif issubclass(s.__class__, SpecStSection):
+				ret.append((s.get_package_name(), s))
+		return ret
+
+	def index_packages(self, entries):
+		'''
+		Add sections appended to the model to the package index
+		@param entries: sections, see L{walk_packages}
+		@type entries: list of (string, L{SpecStSection})
+		@return: None
+		@rtype: None
+		'''
+		for package, section in entries:
+			if issubclass(section.__class__, SpecStPackage) and package is not None:
+				self.package_index[package] = section
+			self.package_sections.setdefault(package, []).append(section)
+
+	def unindex_packages(self, entries):
+		'''
+		Remove sections from the package index
+		@param entries: sections, see L{walk_packages}
+		@type entries: list of (string, L{SpecStSection})
+		@return: None
+		@rtype: None
+		'''
+		for package, section in entries:
+			if self.package_index.get(package) is section:
+				del self.package_index[package]
+			self.package_sections[package].remove(section)
+			if not self.package_sections[package]:
+				del self.package_sections[package]
+
+	@staticmethod
+	def walk_definitions(sections, package = None, context = ()):
+		'''
+		Find definitions within sections, including %if branches and %package
+		definitions
+		@param sections: sections to search in
+		@type sections: list of L{SpecSection}
+		@param package: name of the package sections belong to, None for main
+		@type package: string
+		@param context: %if statements sections live under
+		@type context: tuple of (L{SpecStIf}, Boolean)
+		@return: definitions, their package names and %if statements they live
+		under, in model order
+		@rtype: list of (L{SpecStDefinition}, string, tuple)
+		'''
+		ret = []
+		for s in sections:
+			if issubclass(s.__class__, SpecStIf):
+				ret += SpecModel.walk_definitions(s.get_true_branch() or [], package,
+								context + ((s, True),))
+				ret += SpecModel.walk_definitions(s.get_false_branch() or [], package,
+								context + ((s, False),))
+			elif issubclass(s.__class__, SpecStDefinition):
+				ret.append((s, package, context))
+			elif issubclass(s.__class__, SpecStPackage):
+				ret += SpecModel.walk_definitions(s.get_defs(), s.get_package_name(), context)
+		return ret
+
+	@staticmethod
+	def get_definition_key(name):
+		'''
+		Get key of a definition name in the definition index, tags are case
+		insensitive
+		@param name: definition name e.g. 'Provides:'
+		@type name: string or L{SpecToken}
+		@return: definition index key
+		@rtype: string
+		'''
+		return str(name).lower()
+
+	def index_renamed(self):
+		'''
+		Rebuild the definition index if a definition was renamed since it was
+		built, see L{SpecStDefinition.set_name}
+		@return: None
+		@rtype: None
+		'''
+		if self.definition_renames != SpecStDefinition.renames:
+			self.definition_index = {}
+			self.definition_context = {}
+			self.definition_renames = SpecStDefinition.renames
+			self.index_definitions(self.walk_definitions(self.sections))
+
+	def index_definitions(self, entries):
+		'''
+		Add definitions appended to the model to the definition index
+		@param entries: definitions, see L{walk_definitions}
+		@type entries: list of (L{SpecStDefinition}, string, tuple)
+		@return: None
+		@rtype: None
+		'''
+		for definition, package, context in entries:
+			name = self.get_definition_key(definition.get_name())
+			packages = self.definition_index.get(name)
+			if packages is None:
+				packages = OrderedDict()
+				self.definition_index[name] = packages
+			if package not in packages:
+				packages[package] = []
+			packages[package].append(definition)
+			self.definition_context[definition] = context
+
+	def unindex_definitions(self, entries):
+		'''
+		Remove definitions from the definition index
+		@param entries: definitions, see L{walk_definitions}
+		@type entries: list of (L{SpecStDefinition}, string, tuple)
+		@return: None
+		@rtype: None
+		'''
+		for definition, package, _ in entries:
+			name = self.get_definition_key(definition.get_name())
+			packages = self.definition_index[name]
+			packages[package].remove(definition)
+			if not packages[package]:
+				del packages[package]
+				if not packages:
+					del self.definition_index[name]
+			del self.definition_context[definition]
+
+	def get_definition_entry(self, definition):
+		'''
+		Get package name and %if statements of a definition in the model
+		@param definition: definition
+		@type definition: L{SpecStDefinition}
+		@return: definition, its package name and %if statements it lives under
+		@rtype: tuple (L{SpecStDefinition}, string, tuple)
+		'''
+		context = []
+		child = definition
+		parent = definition.get_parent()
+		while parent is not None and not issubclass(parent.__class__, SpecStPackage):
+			if issubclass(parent.__class__, SpecStIf):
+				context.insert(0, (parent, any(s is child for s in parent.get_true_branch() or [])))
+			child = parent
+			parent = parent.get_parent()
+
+		package = parent.get_package_name() if parent is not None else None
+		return (definition, package, tuple(context))
+
+	def index_definition(self, definition):
+		'''
+		Add a definition which was added to a package section to the
+		definition index
+		@param definition: added definition
+		@type definition: L{SpecStDefinition}
+		@return: None
+		@rtype: None
+		'''
+		if self.transaction is not None:
+			self.transaction.append(('index_definition', definition))
+			return
+
+		self.unshare()
+		self.index_renamed()
+		definition.set_dirty()
+		entry = self.get_definition_entry(definition)
+		name = self.get_definition_key(definition.get_name())
+		parent = definition.get_parent()
+		if name in self.definition_index and entry[1] in self.definition_index[name] \
+				and issubclass(parent.__class__, SpecStPackage) and parent.get_defs()[-1] is definition:
+			# appended at the end of its package, keeps model order
+			self.index_definitions([entry])
+		else:
+			self.index_rebuild()
+
+	def remove_definition(self, definition):
+		'''
+		Remove a definition from the model, wherever it is placed
+		@param definition: definition to be removed
+		@type definition: L{SpecStDefinition}
+		@return: None
+		@rtype: None
+		@raise SpecNotFound: if definition is not found
+		'''
+		if definition.get_parent() is None:
+			self.remove(definition)
+			return
+
+		definition = self.own(definition)
+		if self.transaction is not None:
+			self.transaction.append(('remove_definition', definition))
+			return
+
+		sections = self.get_definition_container(definition)
+		if definition not in sections:
+			raise SpecNotFound("Definition '%s' not found" % str(definition.get_name()))
+
+		self.unshare()
+		self.index_renamed()
+
+		entry = self.get_definition_entry(definition)
+		sections.remove(definition)
+		self.unindex_definitions([entry])
+
+	def get_definition_container(self, definition):
+		'''
+		Get list of sections a definition is placed in
+		@param definition: definition
+		@type definition: L{SpecStDefinition}
+		@return: model sections, %package definitions or %if branch
+		@rtype: list of L{SpecSection}
+		'''
+		parent = definition.get_parent()
+		if parent is None:
+			return self.sections
+		elif issubclass(parent.__class__, SpecStPackage):
+			return parent.get_defs()
+		elif any(s is definition for s in parent.get_true_branch() or []):
+			return parent.get_true_branch()
+		else:
+			return parent.get_false_branch()
 
 	def append(self, section):
 		'''
@@ -71,7 +402,16 @@ class SpecModel(object):
 		@return: None
 		@rtype: None
 		'''
+		if self.transaction is not None:
+			self.transaction.append(('append', section))
+			return
+
+		self.unshare()
+		self.index_renamed()
 		self.sections.append(section)
+		self.index_add(section)
+		if self.owned is not None:
+			self.owned.add(section)
 
 	def remove(self, section):
 		'''
@@ -82,8 +422,18 @@ class SpecModel(object):
 		@rtype: None
 		@raise SpecNotFound: if section is not found
 		'''
+		section = self.replaced.get(section, section)
+		if self.transaction is not None:
+			self.transaction.append(('remove', section))
+			return
+
 		if section in self.sections:
+			self.unshare()
+			self.index_renamed()
 			self.sections.remove(section)
+			self.section_index[section.__class__].remove(section)
+			self.unindex_definitions(self.walk_definitions([section]))
+			self.unindex_packages(self.walk_packages([section]))
 		else:
 			raise SpecNotFound("Section '%s' not found", str(section))
 
@@ -96,15 +446,216 @@ class SpecModel(object):
 		@rtype: None
 		'''
 		for item in items:
-			self.sections.append(item)
+			self.append(item)
 
-	def add(self, section):
+	def begin(self):
 		'''
-		Add a section, try to guess the most suitable position for the section
-		@param section: section to be added
-		@type section: L{SpecSection}
+		Begin a transaction, modifications are collected and applied at once
+		on L{commit}
+		@return: None
+		@rtype: None
+		@raise SpecBadParam: if a transaction was already begun
+		@note: the model is not modified until the transaction is committed,
+		except definitions added to %package sections by editors, see
+		L{index_definition}
+		'''
+		if self.transaction is not None:
+			raise SpecBadParam("Transaction already begun")
+		self.transaction = []
+
+	def in_transaction(self):
+		'''
+		Check whether modifications are collected in a transaction
+		@return: True if a transaction was begun
+		@rtype: Boolean
+		'''
+		return self.transaction is not None
+
+	def commit(self):
+		'''
+		Apply modifications collected in a transaction - removals and appends
+		are done in one pass, added sections are placed afterwards and indexes
+		are rebuilt once at the end
 		@return: None
 		@rtype: None
+		@raise SpecNotFound: if a removed section is not found, the transaction
+		is rolled back
+		'''
+		ops = self.transaction
+		pending = []
+		removed = set()
+		removed_definitions = {}
+		for op, section in ops:
+			if op == 'append' or op == 'add':
+				pending.append((op, section))
+			elif op == 'remove':
+				idx = [ i for i, p in enumerate(pending) if p[1] is section ]
+				if idx:
+					del pending[idx[0]] # added and removed in the transaction
+				elif section in removed:
+					self.rollback()
+					raise SpecNotFound("Section '%s' not found" % str(section))
+				else:
+					removed.add(section)
+			elif op == 'remove_definition':
+				sections = self.get_definition_container(section)
+				removed_definitions.setdefault(id(sections), (sections, set()))[1].add(section)
+
+		# check everything first, so nothing is applied on failure
+		if removed.difference(self.sections):
+			self.rollback()
+			raise SpecNotFound("Section '%s' not found" % str(removed.difference(self.sections).pop()))
+		for sections, definitions in removed_definitions.itervalues():
+			if definitions.difference(sections):
+				self.rollback()
+				raise SpecNotFound("Definition '%s' not found"
+						% str(definitions.difference(sections).pop().get_name()))
+
+		self.transaction = None
+		self.unshare()
+		if removed:
+			self.sections[:] = [ s for s in self.sections if s not in removed ]
+		for sections, definitions in removed_definitions.itervalues():
+			sections[:] = [ s for s in sections if s not in definitions ]
+		self.sections += [ s for op, s in pending if op == 'append' ]
+
+		added = [ s for op, s in pending if op == 'add' ]
+		if added:
+			self.index_sections() # placing needs sections found by class
+			for section in added:
+				self.place(section)
+		self.index_rebuild()
+
+	def rollback(self):
+		'''
+		Discard modifications collected in a transaction, definitions added
+		to %package sections are removed
+		@return: None
+		@rtype: None
+		'''
+		ops = self.transaction
+		self.transaction = None
+		for op, section in reversed(ops):
+			if op == 'index_definition':
+				sections = self.get_definition_container(section)
+				idx = [ i for i, s in enumerate(sections) if s is section ]
+				if idx:
+					del sections[idx[0]]
+
+	def fork(self):
+		'''
+		Fork the model, the fork shares sections with the model until they
+		are modified, see L{own}
+		@return: forked model
+		@rtype: L{SpecModel}
+		@raise SpecBadParam: if called in a transaction
+		'''
+		if self.transaction is not None:
+			raise SpecBadParam("Cannot fork a model in a transaction")
+
+		ret = self.__class__.__new__(self.__class__)
+		ret.__dict__.update(self.__dict__)
+		self.shared = ret.shared = True
+		self.owned = set()
+		ret.owned = set()
+		self.replaced = {}
+		ret.replaced = {}
+		return ret
+
+	def unshare(self):
+		'''
+		Make a private copy of the sections list and indexes shared with a fork
+		before they are modified, sections themselves are still shared
+		@return: None
+		@rtype: None
+		'''
+		if self.shared:
+			self.shared = False
+			self.sections = list(self.sections)
+			self.index_rebuild()
+
+	def own(self, section):
+		'''
+		Get a section which can be modified in place, the section is marked
+		dirty so it is not rendered from its source text
+		@param section: section in the model
+		@type section: L{SpecSection}
+		@return: the section itself or its copy placed in the model instead,
+		see L{unshare_section}
+		@rtype: L{SpecSection}
+		'''
+		section = self.unshare_section(section)
+		section.set_dirty()
+		return section
+
+	def unshare_section(self, section):
+		'''
+		Replace a section shared with a fork by its copy, together with the
+		top level section it lives in
+		@param section: section in the model
+		@type section: L{SpecSection}
+		@return: the section itself or its copy placed in the model instead
+		@rtype: L{SpecSection}
+		'''
+		if self.owned is None:
+			return section
+
+		section = self.replaced.get(section, section)
+		top = section
+		while top.get_parent() is not None:
+			top = top.get_parent()
+		if top in self.owned:
+			return section
+
+		idx = [ i for i, s in enumerate(self.sections) if s is top ]
+		if not idx:
+			return section # not in the model, nothing is shared
+
+		top_copy = copy.deepcopy(top)
+		for orig, section_copy in zip(self.walk_sections([top]), self.walk_sections([top_copy])):
+			self.replaced[orig] = section_copy
+		self.unshare()
+		self.sections[idx[0]] = top_copy
+		self.owned.add(top_copy)
+		self.index_rebuild()
+		if self.transaction is not None:
+			self.transaction = [ (op, self.replaced.get(s, s)) for op, s in self.transaction ]
+		return self.replaced[section]
+
+	@classmethod
+	def get_section_rank(cls, section_class):
+		'''
+		Get rank of a section class in L{SPEC_SECTION_ORDER}, ranks are
+		computed once per section class
+		@param section_class: section class
+		@type section_class: __class__
+		@return: index of the first class in section order the section is
+		a subclass of, the last index if not found
+		@rtype: number
+		'''
+		ranks = cls.__dict__.get('_ranks')
+		if ranks is None:
+			ranks = {}
+			cls._ranks = ranks
+
+		ret = ranks.get(section_class)
+		if ret is None:
+			for ret, sec in enumerate(cls.SPEC_SECTION_ORDER):
+				if issubclass(section_class, sec):
+					break
+			ranks[section_class] = ret
+		return ret
+
+	@classmethod
+	def get_rank_candidates(cls, rank):
+		'''
+		Get ranks which should be searched for a neighbour section when adding
+		a section of a rank, candidates are computed once for all ranks
+		@param rank: rank of the added section
+		@type rank: number
+		@return: ranks in order of preference; sections of lower ranks are
+		followed by the added section, sections of higher ranks precede it
+		@rtype: tuple of numbers
 		'''
 		def get_add_index(idx_find, idx):
 			if idx_find == idx:
@@ -119,63 +670,140 @@ class SpecModel(object):
 			# check bounds
 			if ret < 0:
 				ret = idx + (abs(diff) + 1)
-				if ret >= len(self.SPEC_SECTION_ORDER):
+				if ret >= len(cls.SPEC_SECTION_ORDER):
 					return None
-			elif ret >= len(self.SPEC_SECTION_ORDER):
+			elif ret >= len(cls.SPEC_SECTION_ORDER):
 				ret = idx - abs(diff)
 				if ret < 0:
 					return None
 			return ret
 
+		candidates = cls.__dict__.get('_candidates')
+		if candidates is None:
+			candidates = []
+			for idx in range(len(cls.SPEC_SECTION_ORDER)):
+				ret = []
+				idx_find = get_add_index(idx, idx)
+				while idx_find is not None and idx_find not in ret:
+					ret.append(idx_find)
+					idx_find = get_add_index(idx_find, idx)
+				# the search above gets stuck at the end of section order,
+				# try remaining ranks by distance
+				for diff in range(1, len(cls.SPEC_SECTION_ORDER)):
+					for idx_find in [ idx - diff, idx + diff ]:
+						if 0 <= idx_find < len(cls.SPEC_SECTION_ORDER) and idx_find not in ret:
+							ret.append(idx_find)
+				candidates.append(tuple(ret))
+			cls._candidates = candidates
+
+		return candidates[rank]
+
+	def get_package_position(self):
+		'''
+		Get position where a new %package section should be placed - after
+		preamble, %package and %description sections
+		@return: index to sections
+		@rtype: number
+		'''
+		rank = self.get_section_rank(SpecStPackage)
+		following = set()
+		for sec in self.SPEC_SECTION_ORDER[rank + 1:]:
+			sections = self.find_section(sec)
+			if sections:
+				following.add(sections[0])
+
+		for idx, sec in enumerate(self.sections):
+			if sec in following:
+				return idx
+
+		return len(self.sections)
+
+	def add(self, section):
+		'''
+		Add a section, try to guess the most suitable position for the section
+		@param section: section to be added
+		@type section: L{SpecSection}
+		@return: None
+		@rtype: None
+		'''
 		if issubclass(section.__class__, SpecStDefinition) \
 				or issubclass(section.__class__, SpecStIf):
 			raise SpecNotImplemented("Unable to add definitions and ifs")
 
-		found = False
-		if not issubclass(section.__class__, SpecStPackage):
-			# simple replace
-			for idx, sec in enumerate(self.sections):
-				if issubclass(sec.__class__, section.__class__):
-					SpecDebug.debug("-- replacing section '%s'" % type(section))
-					self.sections[idx] = section
-					found = True
-					break
-
-		if found:
+		if self.transaction is not None:
+			self.transaction.append(('add', section))
 			return
 
-		# replace failed, append section based on section order
+		self.unshare()
+		if self.place(section):
+			self.index_rebuild()
+		else:
+			self.package_index = {}
+			self.package_sections = {}
+			self.index_packages(self.walk_packages(self.sections))
+
+	def place(self, section):
+		'''
+		Place an added section into the model, only the section index is
+		updated, see L{add}
+		@param section: section to be added
+		@type section: L{SpecSection}
+		@return: True if definitions were added or removed, the definition
+		index needs a rebuild then; package index always needs an update
+		@rtype: Boolean
+		@raise SpecNotFound: if no suitable position is found
+		'''
+		if self.owned is not None:
+			self.owned.add(section)
 
 		if issubclass(section.__class__, SpecStPackage):
-			# This needs special checks based on package, not only package, but
-			# description, ... as well
-			raise SpecNotImplemented("Adding %package section not implemented") # TODO: implement
-
-		for idx, sec in enumerate(self.SPEC_SECTION_ORDER):
-			if issubclass(section.__class__, sec):
-				break
-
-		# idx now points to the section in SPEC_SECTION_ORDER
-		idx_find = idx
-		while not found:
-			idx_find = get_add_index(idx_find, idx)
-
-			if idx_find is None:
-				raise SpecNotFound("Section '%s' was not found in section order" % type(section))
-
-			for i, sec in enumerate(self.sections):
-				if issubclass(sec.__class__, self.SPEC_SECTION_ORDER[idx_find]):
-					found = True
-					if idx_find > idx:
-						SpecDebug.debug("-- addiding section '%s' at position before section '%s'" % (type(section), type(sec)))
-						self.sections.insert(i, section)
-					else:
-						SpecDebug.debug("-- addiding section '%s' at position after section '%s'" % (type(section), type(sec)))
-						self.sections.insert(i + 1, section)
-					break
+			# a package of the same name is replaced
+			package = section.get_package_name()
+			sections = [ s for s in self.find_section(SpecStPackage) or [] if s.get_package_name() == package ]
+			if sections:
+				SpecDebug.debug("-- replacing package '%s'" % package)
+				self.sections[self.sections.index(sections[0])] = section
+				self.index_classes([ sections[0].__class__, section.__class__ ])
+				return True
 
-		if not found:
-			raise SpecNotFound("Section '%s' was not added" % type(section))
+			idx = self.get_package_position()
+			SpecDebug.debug("-- adding package '%s' at position %d" % (package, idx))
+			self.sections.insert(idx, section)
+			self.index_classes([ section.__class__ ])
+			return len(self.walk_definitions([section])) > 0
+
+		def get_package_name(s):
+			return s.get_package_name() if issubclass(s.__class__, SpecStSection) else None
+
+		# simple replace of a section of the same package
+		package = get_package_name(section)
+		sections = [ s for s in self.find_section(section.__class__) or [] if get_package_name(s) == package ]
+		if sections:
+			sec = sections[0]
+			SpecDebug.debug("-- replacing section '%s'" % type(section))
+			self.sections[self.sections.index(sec)] = section
+			self.index_classes([ sec.__class__, section.__class__ ])
+			return False
+
+		# replace failed, add section next to its closest neighbour in section order
+		rank = self.get_section_rank(section.__class__)
+		for rank_find in self.get_rank_candidates(rank):
+			sections = self.find_section(self.SPEC_SECTION_ORDER[rank_find])
+			if not sections:
+				continue
+
+			sec = sections[0]
+			idx = self.sections.index(sec)
+			if rank_find > rank:
+				SpecDebug.debug("-- addiding section '%s' at position before section '%s'" % (type(section), type(sec)))
+				self.sections.insert(idx, section)
+			else:
+				SpecDebug.debug("-- addiding section '%s' at position after section '%s'" % (type(section), type(sec)))
+				self.sections.insert(idx + 1, section)
+			self.index_classes([ section.__class__ ])
+			return False
+
+		raise SpecNotFound("Section '%s' was not added" % type(section))
 
 	def get_sections(self):
 		'''
@@ -193,14 +821,130 @@ class SpecModel(object):
 		@return: list of sections of the provided type or None
 		@rtype: list of L{SpecSection}
 		'''
-		ret = None
-		for s in self.sections:
-			if issubclass(s.__class__, section_type):
-				if not ret:
-					ret = []
-				ret.append(s)
+		types = self.section_types.get(section_type)
+		if types is None:
+			types = [ cls for cls in self.section_index if issubclass(cls, section_type) ]
+			self.section_types[section_type] = types
+
+		found = [ self.section_index[cls] for cls in types if self.section_index[cls] ]
+		if not found:
+			return None
+
+		if len(found) == 1:
+			return list(found[0])
+
+		# sections of different classes, keep model order
+		return [ s for s in self.sections if s.__class__ in types ]
+
+	def find_definitions(self, name, packages = None):
+		'''
+		Find definitions of a name
+		@param name: definition name e.g. 'Provides:', matched case insensitive
+		@type name: string
+		@param packages: names of packages to find definitions in, None for
+		main package; all packages if not provided
+		@type packages: list of strings
+		@return: definitions ordered by package, in model order within package
+		@rtype: list of L{SpecStDefinition}
+		'''
+		self.index_renamed()
+		index = self.definition_index.get(self.get_definition_key(name))
+		if not index:
+			return []
+
+		ret = []
+		for package, definitions in index.iteritems():
+			if packages is None or package in packages:
+				ret += definitions
 		return ret
 
+	def get_definition_context(self, definition):
+		'''
+		Get conditional context of a definition
+		@param definition: definition in the model
+		@type definition: L{SpecStDefinition}
+		@return: %if statements the definition lives under, outermost first,
+		with True if the definition is in the true branch
+		@rtype: tuple of (L{SpecStIf}, Boolean)
+		'''
+		self.index_renamed()
+		return self.definition_context[definition]
+
+	def get_name(self):
+		'''
+		Get name of the main package
+		@return: value of the main package 'Name:' or None if not stated
+		@rtype: string
+		'''
+		names = self.find_definitions('Name:', [ None ])
+		return str(names[0].get_value()).strip() if names else None
+
+	def get_package_aliases(self, name):
+		'''
+		Get names a package could be referred to
+		@param name: package name, e.g. 'devel', '-n foo-devel' or 'foo-devel'
+		@type name: string
+		@return: package names in the form used in %package and section
+		arguments, e.g. 'devel' and '-n foo-devel' if main package is 'foo'
+		@rtype: list of strings
+		'''
+		main = self.get_name()
+		full = name[3:] if name.startswith('-n ') else name
+		ret = [ name, '-n ' + full ]
+		if main is not None:
+			if full.startswith(main + '-'):
+				ret.append(full[len(main) + 1:])
+			if not name.startswith('-n '):
+				ret.append('-n %s-%s' % (main, name))
+		return ret
+
+	def find_package(self, name):
+		'''
+		Find a %package section
+		@param name: package name, e.g. 'devel', '-n foo-devel' or 'foo-devel'
+		@type name: string
+		@return: package section or None if not found
+		@rtype: L{SpecStPackage}
+		'''
+		for alias in self.get_package_aliases(name):
+			if alias in self.package_index:
+				return self.package_index[alias]
+		return None
+
+	def find_package_sections(self, name, section_type = None):
+		'''
+		Find sections which belong to a package, e.g. its %package,
+		%description or %files section
+		@param name: package name, None or '-' for main package
+		@type name: string
+		@param section_type: section type to look for, all if None
+		@type section_type: __class__
+		@return: list of sections of the package or None
+		@rtype: list of L{SpecSection}
+		'''
+		if name is None or name == '-':
+			found = [ self.package_sections.get(None, []) ]
+		else:
+			package = self.find_package(name)
+			if package is not None:
+				name = package.get_package_name()
+			found = [ self.package_sections[alias] for alias in self.get_package_aliases(name) \
+						if alias in self.package_sections ]
+
+		if not found:
+			return None
+		elif len(found) == 1:
+			ret = list(found[0])
+		else:
+			# a package referred to by different names, keep model order
+			members = set(s for f in found for s in f)
+			ret = [ s for _, s in self.walk_packages(self.sections) if s in members ]
+
+		if section_type is not None:
+			ret = [ s for s in ret if issubclass(s.__class__, section_type) ]
+
+		return ret or None
+
 	def find_definitions_all(self):
 		'''
 		Find all definitions within spec model
@@ -209,23 +953,4 @@ class SpecModel(object):
 		@raise SpecNotFound:
 		@todo: move to the model itself?
 		'''
-		def xfind_definitions_all(sections):
-			ret = []
-			for s in sections:
-				if issubclass(s.__class__, SpecStIf):
-					b = xfind_definitions_all(s.get_true_branch())
-					if b:
-						ret += b
-					b = xfind_definitions_all(s.get_false_branch())
-					if b:
-						ret += b
-				elif issubclass(s.__class__, SpecStDefinition):
-					ret.append(s)
-				elif issubclass(s.__class__, SpecStPackage):
-					b = xfind_definitions_all(s.get_defs())
-					if b:
-						ret += b
-			return ret
-
-		return xfind_definitions_all(self.sections)
-
+		return [ entry[0] for entry in self.walk_definitions(self.sections) ]
@@ -41,6 +41,53 @@ class SpecModelReader(SpecModelTransformator):
 		'''
 		return self.model.find_section(section_type)
 
+	def find_package(self, name):
+		'''
+		Find a %package section
+		@param name: package name, e.g. 'devel', '-n foo-devel' or 'foo-devel'
+		@type name: string
+		@return: package section or None if not found
+		@rtype: L{SpecStPackage}
+		'''
+		return self.model.find_package(name)
+
+	def find_package_sections(self, name, section_type = None):
+		'''
+		Find sections which belong to a package, e.g. its %package,
+		%description or %files section
+		@param name: package name, None or '-' for main package
+		@type name: string
+		@param section_type: section type to look for, all if None
+		@type section_type: __class__
+		@return: list of sections of the package or None
+		@rtype: list of L{SpecSection}
+		'''
+		return self.model.find_package_sections(name, section_type)
+
+	def find_definitions(self, name, packages = None):
+		'''
+		Find definitions of a name
+		@param name: definition name e.g. 'Provides:'
+		@type name: string
+		@param packages: names of packages to find definitions in, None for
+		main package; all packages if not provided
+		@type packages: list of strings
+		@return: definitions ordered by package, in model order within package
+		@rtype: list of L{SpecStDefinition}
+		'''
+		return self.model.find_definitions(name, packages)
+
+	def get_definition_context(self, definition):
+		'''
+		Get conditional context of a definition
+		@param definition: definition in the model
+		@type definition: L{SpecStDefinition}
+		@return: %if statements the definition lives under, outermost first,
+		with True if the definition is in the true branch
+		@rtype: tuple of (L{SpecStIf}, Boolean)
+		'''
+		return self.model.get_definition_context(definition)
+
 	def find_definitions_all(self):
 		'''
 		Find all definitions within spec model
@@ -25,6 +25,7 @@ An adapter used to communicate with model, write methods
 @license: GPL 2.0
 '''
 
+from contextlib import contextmanager
 from specModelTransformator import SpecModelTransformator
 
 class SpecModelWriter(SpecModelTransformator):
@@ -73,3 +74,59 @@ class SpecModelWriter(SpecModelTransformator):
 		'''
 		return self.model.add(section)
 
+	def index_definition(self, definition):
+		'''
+		Notify model about a definition added to a package section
+		@param definition: added definition
+		@type definition: L{SpecStDefinition}
+		@return: None
+		@rtype: None
+		'''
+		self.model.index_definition(definition)
+
+	def remove_definition(self, definition):
+		'''
+		Remove a definition from the model, wherever it is placed
+		@param definition: definition to be removed
+		@type definition: L{SpecStDefinition}
+		@return: None
+		@rtype: None
+		@note: top level definitions are removed using L{remove}
+		'''
+		if definition.get_parent() is None:
+			self.remove(definition)
+		else:
+			self.model.remove_definition(definition)
+
+	def own(self, section):
+		'''
+		Get a section which can be modified in place, see L{SpecModel.own}
+		@param section: section to be modified
+		@type section: L{SpecSection}
+		@return: section to be modified instead
+		@rtype: L{SpecSection}
+		'''
+		return self.model.own(section)
+
+	@contextmanager
+	def batch(self):
+		'''
+		Collect modifications done within a with block and apply them at once
+		when the block is left, modifications are discarded if an exception is
+		raised; nested blocks join the outer one
+		@return: context manager
+		@rtype: context manager
+		@note: the model is not modified until the block is left, see
+		L{SpecModel.begin}
+		'''
+		if self.model.in_transaction():
+			yield self
+			return
+
+		self.model.begin()
+		try:
+			yield self
+		except:
+			self.model.rollback()
+			raise
+		self.model.commit()
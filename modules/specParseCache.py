@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# ####################################################################
+# specker-lib - spec file manipulation library
+# Copyright (C) 2015  Fridolin Pokorny, fpokorny@redhat.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ####################################################################
+'''
+Persistent on-disk cache of parsed spec models
+@author: Fridolin Pokorny
+@contact: fpokorny@redhat.com
+@organization: Red Hat Inc.
+@license: GPL 2.0
+'''
+
+import os
+import zlib
+import errno
+import glob
+import hashlib
+import tempfile
+import cPickle as pickle
+from specDebug import SpecDebug
+
+class SpecParseCache(object):
+	'''
+	A directory of parsed sections keyed by hash of a spec file content, least
+	recently used entries are evicted once the cache exceeds its size limit
+	@cvar VERSION: version of the cached format, part of every key so entries
+	of an older specker are never loaded
+	@cvar SUFFIX: suffix of cache entries
+	@cvar DEFAULT_SIZE_LIMIT: default size limit of the cache in bytes
+	'''
+	VERSION = '3'
+	SUFFIX = '.spc'
+	DEFAULT_SIZE_LIMIT = 64 * 1024 * 1024
+
+	def __init__(self, path, size_limit = None, sources = None):
+		'''
+		Init L{SpecParseCache}
+		@param path: cache directory, created if it does not exist
+		@type path: string
+		@param size_limit: maximum size of the cache in bytes,
+		L{DEFAULT_SIZE_LIMIT} if None
+		@type size_limit: number
+		@param sources: paths to custom source files parsed results depend
+		on, their content is part of every key
+		@type sources: list of strings
+		@return: None
+		@rtype: None
+		'''
+		self.path = path
+		self.size_limit = size_limit if size_limit is not None else self.DEFAULT_SIZE_LIMIT
+
+		h = hashlib.sha1()
+		for source in sources or []:
+			with open(source, 'r') as f:
+				h.update(f.read() + '\0')
+		self.sources = h.hexdigest()
+
+		try:
+			os.makedirs(path)
+		except OSError as e:
+			if e.errno != errno.EEXIST:
+				raise
+
+	@classmethod
+	def get_version(cls):
+		'''
+		Get specker version, a hash of sources of specker modules - pickled
+		objects and parsers are defined there; computed once per class
+		@return: specker version
+		@rtype: string
+		'''
+		version = cls.__dict__.get('_version')
+		if version is None:
+			h = hashlib.sha1()
+			for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+				with open(path, 'r') as f:
+					h.update(f.read())
+			version = h.hexdigest()
+			cls._version = version
+		return version
+
+	def get_key(self, content, salt = ''):
+		'''
+		Compute a cache key
+		@param content: spec file content
+		@type content: string or mmap
+		@param salt: additional data the parsed result depends on, e.g.
+		registered parsers
+		@type salt: string
+		@return: cache key
+		@rtype: string
+		'''
+		h = hashlib.sha1()
+		h.update(self.VERSION + '\0' + self.get_version() + '\0' + self.sources + '\0' + salt + '\0')
+		h.update(content)
+		return h.hexdigest()
+
+	def get_entry_path(self, key):
+		'''
+		Get path of a cache entry
+		@param key: cache key
+		@type key: string
+		@return: path to the cache entry
+		@rtype: string
+		'''
+		return os.path.join(self.path, key + self.SUFFIX)
+
+	def load(self, key):
+		'''
+		Load cached sections, a hit marks the entry as recently used
+		@param key: cache key, see L{get_key}
+		@type key: string
+		@return: cached sections or None on a miss
+		@rtype: list of L{SpecSection}
+		'''
+		path = self.get_entry_path(key)
+		try:
+			with open(path, 'rb') as f:
+				data = f.read()
+		except IOError:
+			SpecDebug.debug("-- parse cache miss '%s'" % key)
+			return None
+
+		try:
+			ret = pickle.loads(zlib.decompress(data))
+		except Exception as e:
+			SpecDebug.debug("-- dropping broken parse cache entry '%s': %s" % (key, str(e)))
+			self.remove(key)
+			return None
+
+		try:
+			os.utime(path, None)
+		except OSError:
+			pass # entry evicted meanwhile
+
+		SpecDebug.debug("-- parse cache hit '%s'" % key)
+		return ret
+
+	def store(self, key, sections):
+		'''
+		Store parsed sections and evict least recently used entries
+		@param key: cache key, see L{get_key}
+		@type key: string
+		@param sections: parsed sections
+		@type sections: list of L{SpecSection}
+		@return: None
+		@rtype: None
+		@note: failures are not fatal, sections are not cached then
+		'''
+		try:
+			data = zlib.compress(pickle.dumps(sections, pickle.HIGHEST_PROTOCOL))
+		except (pickle.PicklingError, TypeError) as e:
+			SpecDebug.debug("-- sections cannot be cached: %s" % str(e))
+			return
+
+		# write to a temporary file first so concurrent readers never see
+		# a partial entry
+		try:
+			fd, tmp = tempfile.mkstemp(suffix = '.tmp', dir = self.path)
+			try:
+				with os.fdopen(fd, 'wb') as f:
+					f.write(data)
+				os.rename(tmp, self.get_entry_path(key))
+			except:
+				os.unlink(tmp)
+				raise
+		except EnvironmentError as e:
+			SpecDebug.debug("-- failed to store parse cache entry '%s': %s" % (key, str(e)))
+			return
+
+		SpecDebug.debug("-- parse cache store '%s' (%d bytes)" % (key, len(data)))
+		self.evict()
+
+	def remove(self, key):
+		'''
+		Remove a cache entry
+		@param key: cache key
+		@type key: string
+		@return: None
+		@rtype: None
+		'''
+		try:
+			os.unlink(self.get_entry_path(key))
+		except OSError:
+			pass
+
+	def evict(self):
+		'''
+		Remove least recently used entries until the cache fits its size limit
+		@return: None
+		@rtype: None
+		'''
+		entries = []
+		size = 0
+		for name in os.listdir(self.path):
+			if not name.endswith(self.SUFFIX):
+				continue
+
+			path = os.path.join(self.path, name)
+			try:
+				info = os.stat(path)
+			except OSError:
+				continue
+
+			entries.append((info.st_mtime, info.st_size, path))
+			size += info.st_size
+
+		if size <= self.size_limit:
+			return
+
+		entries.sort()
+		for _, entry_size, path in entries:
+			if size <= self.size_limit:
+				break
+
+			try:
+				os.unlink(path)
+				SpecDebug.debug("-- parse cache evicted '%s'" % path)
+			except OSError:
+				pass
+			size -= entry_size
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# ####################################################################
+# specker-lib - spec file manipulation library
+# Copyright (C) 2015  Fridolin Pokorny, fpokorny@redhat.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ####################################################################
+'''
+Parallel processing of spec files by a pool of worker processes
+@author: Fridolin Pokorny
+@contact: fpokorny@redhat.com
+@organization: Red Hat Inc.
+@license: GPL 2.0
+'''
+
+import cStringIO
+import functools
+import itertools
+import traceback
+import multiprocessing
+from specDebug import SpecDebug
+from specDefaultEditor import SpecDefaultEditor
+from specError import SpecBadParam
+from specFileParser import SpecFileParser
+from specFileRenderer import SpecFileRenderer
+from specModelReader import SpecModelReader
+from specModelWriter import SpecModelWriter
+
+def process_spec_file(path, edit = None):
+	'''
+	Parse, edit and render a spec file
+	@param path: path to a spec file
+	@type path: string
+	@param edit: module level function called with L{SpecDefaultEditor} of the
+	parsed spec file, no edits if None
+	@type edit: func(L{SpecDefaultEditor})
+	@return: rendered spec file
+	@rtype: string
+	'''
+	parser = SpecFileParser(SpecModelWriter())
+	with open(path, 'r') as f:
+		parser.init(f)
+	parser.parse()
+
+	editor = SpecDefaultEditor(SpecModelReader(parser.get_model_writer().get_model()),
+									parser.get_model_writer())
+	if edit is not None:
+		edit(editor)
+
+	output = cStringIO.StringIO()
+	SpecFileRenderer(editor.get_model_reader()).render(output)
+	return output.getvalue()
+
+def call_job(job):
+	'''
+	Run a job in a worker, exceptions are returned instead of being raised so
+	one failing item does not stop others
+	@param job: function and its argument
+	@type job: tuple (func, any)
+	@return: result of the function and None, or None and error message
+	@rtype: tuple (any, string)
+	'''
+	func, item = job
+	try:
+		return (func(item), None)
+	except Exception as e:
+		SpecDebug.debug(traceback.format_exc())
+		return (None, str(e))
+
+class SpecPool(object):
+	'''
+	A pool of worker processes mapping a function over items (usually paths of
+	spec files), results are always reported in order of items
+	@note: functions and items are passed to workers by pickle, functions have
+	to be defined on module level
+	@note: with a single worker, items are processed in the current process
+	'''
+	def __init__(self, workers = None, chunk_size = 1, initializer = None, initargs = ()):
+		'''
+		Init L{SpecPool}
+		@param workers: number of worker processes, number of CPUs if None
+		@type workers: number
+		@param chunk_size: number of items sent to a worker at once
+		@type chunk_size: number
+		@param initializer: function called in each worker when started
+		@type initializer: func(*initargs)
+		@param initargs: arguments of initializer
+		@type initargs: tuple
+		@return: None
+		@rtype: None
+		@raise SpecBadParam: if number of workers or chunk size is not positive
+		'''
+		if workers is None:
+			workers = multiprocessing.cpu_count()
+
+		if workers < 1:
+			raise SpecBadParam("Number of workers has to be positive")
+
+		if chunk_size < 1:
+			raise SpecBadParam("Chunk size has to be positive")
+
+		self.workers = workers
+		self.chunk_size = chunk_size
+		self.pool = None
+
+		if workers > 1:
+			self.pool = multiprocessing.Pool(workers, initializer, initargs)
+		elif initializer is not None:
+			initializer(*initargs)
+
+	def imap(self, func, items):
+		'''
+		Map a function over items in worker processes
+		@param func: module level function to be called with each item
+		@type func: func(any) -> any
+		@param items: items to be processed
+		@type items: iterable
+		@return: items with their results and error messages in order of
+		items, result is None and error message is set if func raised
+		@rtype: generator of tuples (any, any, string)
+		'''
+		items = list(items)
+		jobs = [ (func, item) for item in items ]
+
+		if self.pool is None:
+			results = (call_job(job) for job in jobs)
+		else:
+			results = self.pool.imap(call_job, jobs, self.chunk_size)
+
+		for item, (ret, error) in itertools.izip(items, results):
+			yield item, ret, error
+
+	def process(self, paths, edit = None):
+		'''
+		Parse, edit and render spec files, see L{process_spec_file}
+		@param paths: paths to spec files
+		@type paths: list of strings
+		@param edit: module level function called with L{SpecDefaultEditor} of
+		each spec file, no edits if None
+		@type edit: func(L{SpecDefaultEditor})
+		@return: paths with their rendered spec files and error messages
+		@rtype: generator of tuples (string, string, string)
+		'''
+		if edit is None:
+			return self.imap(process_spec_file, paths)
+
+		return self.imap(functools.partial(process_spec_file, edit = edit), paths)
+
+	def close(self):
+		'''
+		Wait for workers to finish and stop them
+		@return: None
+		@rtype: None
+		'''
+		if self.pool is not None:
+			self.pool.close()
+			self.pool.join()
+			self.pool = None
@@ -32,13 +32,76 @@ from specSectionMeta import *
 class SpecSection(object):
 	'''
 	A generic spec section
+	@cvar span: token store and offsets of the parsed section text in its
+	source buffer, None if the section was modified or not parsed
+	@note: a section is marked dirty by its setters and when its tokens are
+	modified in place, see L{SpecTokenStore.is_modified}
 	'''
 	__metaclass__ = SpecSectionMeta
 
+	span = None
+
 	def __init__(self, parent = None):
 		self.parent = parent
 		self.tokens = []
 
+	def get_span(self):
+		'''
+		Get the parsed section text location
+		@return: token store, start and end offset in its source buffer or
+		None if section is dirty
+		@rtype: tuple (L{SpecTokenStore}, number, number)
+		'''
+		if self.span is not None and self.span[0].is_modified(self.span[1], self.span[2]):
+			self.set_dirty()
+		return self.span
+
+	def set_span(self, store, start, end):
+		'''
+		Set the parsed section text location
+		@param store: token store the section was parsed from
+		@type store: L{SpecTokenStore}
+		@param start: offset of the section text in source
+		@type start: number
+		@param end: offset after the section text in source
+		@type end: number
+		@return: None
+		@rtype: None
+		'''
+		self.span = (store, start, end)
+
+	def set_dirty(self):
+		'''
+		Mark section and sections it is nested in as modified, they are
+		rendered from their tokens instead of their source text
+		@return: None
+		@rtype: None
+		'''
+		section = self
+		while section is not None:
+			if section.span is not None:
+				section.span = None
+			section = section.parent
+
+	def is_dirty(self):
+		'''
+		Check whether the section has to be rendered from its tokens
+		@return: True if the section was modified or not parsed
+		@rtype: Boolean
+		'''
+		return self.get_span() is None
+
+	def __getstate__(self):
+		'''
+		Get state to be pickled, the source text location is not pickled as
+		the source buffer can be a mapped file
+		@return: section state
+		@rtype: dict
+		'''
+		ret = self.__dict__.copy()
+		ret.pop('span', None)
+		return ret
+
 	def get_parent(self):
 		'''
 		Get parent section
@@ -80,6 +143,7 @@ class SpecStIf(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.if_token = token
 
 	def set_expr(self, expr):
@@ -90,6 +154,7 @@ class SpecStIf(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.expr = expr
 
 	def set_true_branch(self, branch):
@@ -100,6 +165,7 @@ class SpecStIf(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.true_branch = branch
 
 	def set_else_token(self, els):
@@ -110,6 +176,7 @@ class SpecStIf(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.else_token = els
 
 	def set_false_branch(self, branch):
@@ -120,6 +187,7 @@ class SpecStIf(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.false_branch = branch
 
 	def set_endif_token(self, endi):
@@ -130,6 +198,7 @@ class SpecStIf(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.endif_token = endi
 
 	def get_if_token(self):
@@ -199,6 +268,7 @@ class SpecStTag(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.name = name
 
 	def set_value(self, val):
@@ -209,6 +279,7 @@ class SpecStTag(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.value = val
 
 	def get_name(self):
@@ -230,9 +301,13 @@ class SpecStTag(SpecSection):
 class SpecStDefinition(SpecSection):
 	'''
 	Definition representation
+	@cvar renames: number of definitions renamed so far, a model re-indexes
+	its definitions once it changes, see L{SpecModel.index_renamed}
 	'''
 	__metaclass__ = SpecStDefinitionMeta
 
+	renames = 0
+
 	def __init__(self, parent):
 		self.parent = parent
 		self.name = None
@@ -246,6 +321,9 @@ class SpecStDefinition(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
+		if self.name is not None:
+			SpecStDefinition.renames += 1
 		self.name = name
 
 	def set_value(self, val):
@@ -256,6 +334,7 @@ class SpecStDefinition(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.value = val
 
 	def get_name(self):
@@ -284,7 +363,7 @@ class SpecStDefinition(SpecSection):
 		while parent != None:
 			if issubclass(parent.__class__, SpecStPackage):
 				return parent
-			parent = self.parent
+			parent = parent.parent
 
 		return None
 
@@ -308,6 +387,7 @@ class SpecStGlobal(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.global_token = glb
 
 	def set_variable(self, var):
@@ -318,6 +398,7 @@ class SpecStGlobal(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.variable = var
 
 	def set_value(self, val):
@@ -328,6 +409,7 @@ class SpecStGlobal(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.value = val
 
 	def get_global_token(self):
@@ -374,6 +456,7 @@ class SpecStDefine(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.define_token = dfn
 
 	def set_variable(self, var):
@@ -384,6 +467,7 @@ class SpecStDefine(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.variable = var
 
 	def set_value(self, val):
@@ -394,6 +478,7 @@ class SpecStDefine(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.value = val
 
 	def get_define_token(self):
@@ -440,6 +525,7 @@ class SpecStEof(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.eof_token = eof
 
 	def get_eof_token(self):
@@ -450,6 +536,35 @@ class SpecStEof(SpecSection):
 		'''
 		return self.eof_token
 
+class SpecStTail(SpecSection):
+	'''
+	Unparsed rest of a partially parsed spec file
+	'''
+	__metaclass__ = SpecStTailMeta
+
+	def __init__(self, parent = None):
+		self.parent = None
+		self.tokens = None
+
+	def set_tokens(self, tkns):
+		'''
+		Set unparsed tokens
+		@param tkns: tokens up to the end of file
+		@type tkns: L{SpecTokenList}
+		@return: None
+		@rtype: None
+		'''
+		self.set_dirty()
+		self.tokens = tkns
+
+	def get_tokens(self):
+		'''
+		Get unparsed tokens
+		@return: tokens up to the end of file
+		@rtype: L{SpecTokenList}
+		'''
+		return self.tokens
+
 class SpecStExpression(SpecSection):
 	'''
 	An expression representation
@@ -468,6 +583,7 @@ class SpecStExpression(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.tokens = tkns
 
 	def get_tokens(self):
@@ -497,6 +613,7 @@ class SpecStSection(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.token_section = tkn
 
 	def set_tokens(self, tkns):
@@ -507,6 +624,7 @@ class SpecStSection(SpecSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.tokens = tkns
 
 	def get_token_section(self):
@@ -525,6 +643,38 @@ class SpecStSection(SpecSection):
 		'''
 		return self.tokens
 
+	def get_package_name(self):
+		'''
+		Get name of the package the section belongs to as stated in section
+		arguments, e.g. 'devel' for '%files devel' or '-n foo' for '%post -n foo'
+		@return: package name or None if section belongs to main package
+		@rtype: string
+		'''
+		def ends_line(token):
+			return '\n' in token.get_append().replace('\\\n', '')
+
+		# arguments follow on the section line, line numbers are not used as
+		# created tokens do not have them
+		args = []
+		token = self.token_section
+		tokens = self.get_tokens()
+		while token is not None and not ends_line(token) and len(args) < len(tokens):
+			token = tokens[len(args)]
+			args.append(str(token))
+
+		ret = None
+		i = 0
+		while i < len(args) and args[i] != '--': # trigger conditions follow
+			if args[i] == '-n' and i + 1 < len(args):
+				return '-n ' + args[i + 1]
+			elif args[i] in [ '-f', '-l', '-p', '-P' ]: # options with an argument
+				i += 1
+			elif not args[i].startswith('-') and ret is None:
+				ret = args[i]
+			i += 1
+
+		return ret
+
 class SpecStDescription(SpecStSection):
 	'''
 	Description section representation
@@ -566,6 +716,7 @@ class SpecStChangelog(SpecStSection):
 			@return: None
 			@rtype: None
 			'''
+			self.set_dirty()
 			self.star = star
 
 		def set_date(self, date):
@@ -576,6 +727,7 @@ class SpecStChangelog(SpecStSection):
 			@return: None
 			@rtype: None
 			'''
+			self.set_dirty()
 			self.date = date
 
 		def set_date_parsed(self, date_parsed):
@@ -596,6 +748,7 @@ class SpecStChangelog(SpecStSection):
 			@return: None
 			@rtype: None
 			'''
+			self.set_dirty()
 			self.user = user
 
 		def set_user_email(self, user_email):
@@ -606,6 +759,7 @@ class SpecStChangelog(SpecStSection):
 			@return: None
 			@rtype: None
 			'''
+			self.set_dirty()
 			self.user_email = user_email
 
 		def set_version_delim(self, version_delim):
@@ -616,6 +770,7 @@ class SpecStChangelog(SpecStSection):
 			@return: None
 			@rtype: None
 			'''
+			self.set_dirty()
 			self.version_delim = version_delim
 
 		def set_version(self, version):
@@ -626,6 +781,7 @@ class SpecStChangelog(SpecStSection):
 			@return: None
 			@rtype: None
 			'''
+			self.set_dirty()
 			self.version = version
 
 		def set_message(self, message):
@@ -636,6 +792,7 @@ class SpecStChangelog(SpecStSection):
 			@return: None
 			@rtype: None
 			'''
+			self.set_dirty()
 			self.message = message
 
 		def get_star(self):
@@ -717,6 +874,7 @@ class SpecStChangelog(SpecStSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.entries = entries
 
 	def get_entries(self):
@@ -727,12 +885,21 @@ class SpecStChangelog(SpecStSection):
 		'''
 		return self.entries
 
+	def get_package_name(self):
+		'''
+		Get name of the package the section belongs to
+		@return: None, changelog always belongs to main package
+		@rtype: None
+		'''
+		return None
+
 	def append_entry(self, entry):
 		'''
 		Append a changelog entry
 		@param entry: changelog entry to be appended
 		@type entry: L{SpecStChangelogEntry}
 		'''
+		self.set_dirty()
 		self.entries.append(entry)
 
 	def insert_entry(self, entry):
@@ -741,8 +908,12 @@ class SpecStChangelog(SpecStSection):
 		@param entry: changelog entry to be inserted
 		@type entry: L{SpecStChangelog.SpecStChangelogEntry}
 		'''
+		self.set_dirty()
 		self.entries.insert(0, entry)
 
+# nested classes are looked up by pickle on module level
+SpecStChangelogEntry = SpecStChangelog.SpecStChangelogEntry
+
 class SpecStCheck(SpecStSection):
 	'''
 	Check section representation
@@ -787,6 +958,7 @@ class SpecStPackage(SpecStSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.defs = defs
 
 	def set_package(self, pkg):
@@ -797,6 +969,7 @@ class SpecStPackage(SpecStSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.pkg = pkg
 
 	def get_package(self):
@@ -807,6 +980,14 @@ class SpecStPackage(SpecStSection):
 		'''
 		return self.pkg
 
+	def get_package_name(self):
+		'''
+		Get package name, e.g. 'devel' or '-n foo'
+		@return: package name or None if package name is not stated
+		@rtype: string
+		'''
+		return str(self.pkg) if self.pkg is not None else None
+
 	def get_defs(self):
 		'''
 		Get package definitions
@@ -823,6 +1004,7 @@ class SpecStPackage(SpecStSection):
 		@return: None
 		@rtype: None
 		'''
+		self.set_dirty()
 		self.defs.append(item)
 
 class SpecStPrep(SpecStSection):
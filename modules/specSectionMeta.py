@@ -95,6 +95,16 @@ class SpecStEofMeta(SpecSectionMeta):
 		'''
 		return "<EOF>"
 
+class SpecStTailMeta(SpecSectionMeta):
+	'''
+	metaclass for L{SpecStTail}
+	'''
+	def __repr__(c):
+		'''
+		section representation
+		'''
+		return "<unparsed>"
+
 class SpecStExpressionMeta(SpecSectionMeta):
 	'''
 	metaclass for L{SpecStExpression}
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+# ####################################################################
+# specker-lib - spec file manipulation library
+# Copyright (C) 2015  Fridolin Pokorny, fpokorny@redhat.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ####################################################################
+'''
+A server keeping parsed spec models in memory and its client, requests and
+responses are JSON objects, one per line, sent over a Unix socket
+@author: Fridolin Pokorny
+@contact: fpokorny@redhat.com
+@organization: Red Hat Inc.
+@license: GPL 2.0
+'''
+
+import os
+import sys
+import json
+import errno
+import socket
+import threading
+import traceback
+import SocketServer
+import cPickle as pickle
+
+def encode_strings(obj):
+	'''
+	Encode unicode strings of a decoded JSON object to UTF-8, spec files are
+	handled as byte strings
+	@param obj: decoded JSON object
+	@type obj: any
+	@return: the object with encoded strings
+	@rtype: any
+	'''
+	if isinstance(obj, unicode):
+		return obj.encode('utf-8')
+	if isinstance(obj, list):
+		return [ encode_strings(x) for x in obj ]
+	if isinstance(obj, dict):
+		return dict((encode_strings(k), encode_strings(v)) for k, v in obj.iteritems())
+	return obj
+
+class SpecModelCache(object):
+	'''
+	Parsed spec models kept in memory, keyed by path, a model is parsed again
+	once its spec file is modified
+	@note: models returned by L{get} are shared, use L{get_copy} if a model is
+	going to be modified
+	'''
+	def __init__(self, parse):
+		'''
+		Init L{SpecModelCache}
+		@param parse: function parsing a spec file
+		@type parse: func(string) -> L{SpecModel}
+		@return: None
+		@rtype: None
+		'''
+		self.parse = parse
+		self.entries = {}
+
+	def get_entry(self, path):
+		'''
+		Get an up-to-date cache entry, parse the spec file if needed
+		@param path: path to a spec file
+		@type path: string
+		@return: cache entry
+		@rtype: dict
+		'''
+		path = os.path.abspath(path)
+		info = os.stat(path)
+		stamp = (info.st_mtime, info.st_size, info.st_ino)
+
+		entry = self.entries.get(path)
+		if entry is None or entry['stamp'] != stamp:
+			entry = { 'stamp': stamp, 'model': self.parse(path), 'pickled': None }
+			self.entries[path] = entry
+
+		return entry
+
+	def get(self, path):
+		'''
+		Get a parsed spec model, the model B{MUST NOT} be modified
+		@param path: path to a spec file
+		@type path: string
+		@return: shared spec model
+		@rtype: L{SpecModel}
+		'''
+		return self.get_entry(path)['model']
+
+	def get_copy(self, path):
+		'''
+		Get a private copy of a parsed spec model
+		@param path: path to a spec file
+		@type path: string
+		@return: spec model which can be modified
+		@rtype: L{SpecModel}
+		'''
+		entry = self.get_entry(path)
+		if entry['pickled'] is None:
+			entry['pickled'] = pickle.dumps(entry['model'], pickle.HIGHEST_PROTOCOL)
+		return pickle.loads(entry['pickled'])
+
+	def remove(self, path):
+		'''
+		Drop a cached spec model
+		@param path: path to a spec file
+		@type path: string
+		@return: None
+		@rtype: None
+		'''
+		self.entries.pop(os.path.abspath(path), None)
+
+class SpecRequestHandler(SocketServer.StreamRequestHandler):
+	'''
+	Handle a request of a connected client, the connection is closed once
+	the request is answered
+	@cvar timeout: seconds to wait for a request, an idle client is then
+	disconnected
+	'''
+	timeout = 10
+
+	def handle(self):
+		'''
+		Read a request line and answer it
+		@return: None
+		@rtype: None
+		'''
+		try:
+			line = self.rfile.readline()
+		except socket.timeout:
+			return
+
+		if not line:
+			return
+
+		try:
+			with self.server.lock:
+				response = json.dumps(self.server.callback(encode_strings(json.loads(line))))
+		except Exception as e:
+			response = json.dumps({ 'error': str(e), 'traceback': traceback.format_exc() })
+
+		self.wfile.write(response + '\n')
+		self.wfile.flush()
+
+class SpecServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+	'''
+	A server passing requests of clients to a callback, each connection is
+	served in its own thread so an idle client does not block others, but
+	the callback is called for one request at a time so it does not need to
+	be thread safe
+	'''
+	daemon_threads = True
+
+	def __init__(self, path, callback):
+		'''
+		Init L{SpecServer}
+		@param path: path to the Unix socket, a stale socket is removed
+		@type path: string
+		@param callback: function handling a request
+		@type callback: func(dict) -> dict
+		@return: None
+		@rtype: None
+		'''
+		try:
+			os.unlink(path)
+		except OSError as e:
+			if e.errno != errno.ENOENT:
+				raise
+
+		self.path = path
+		self.callback = callback
+		self.lock = threading.Lock()
+		self.running = False
+		self.timeout = 0.5 # check for stop() twice a second
+		SocketServer.UnixStreamServer.__init__(self, path, SpecRequestHandler)
+
+	def serve(self):
+		'''
+		Serve requests until L{stop} is called
+		@return: None
+		@rtype: None
+		'''
+		self.running = True
+		while self.running:
+			self.handle_request()
+
+	def stop(self):
+		'''
+		Stop serving once the current request is handled, safe to be called
+		from a signal handler
+		@return: None
+		@rtype: None
+		'''
+		self.running = False
+
+	def handle_error(self, request, client_address):
+		'''
+		Report an error raised when handling a request, exit requests (e.g.
+		raised by a signal handler) are not suppressed
+		@param request: request which failed
+		@param client_address: address of the client
+		@return: None
+		@rtype: None
+		'''
+		if isinstance(sys.exc_info()[1], (SystemExit, KeyboardInterrupt)):
+			raise
+
+		SocketServer.UnixStreamServer.handle_error(self, request, client_address)
+
+	def server_close(self):
+		'''
+		Close the server and remove its socket
+		@return: None
+		@rtype: None
+		'''
+		SocketServer.UnixStreamServer.server_close(self)
+		try:
+			os.unlink(self.path)
+		except OSError:
+			pass
+
+class SpecClient(object):
+	'''
+	A client of L{SpecServer}, a connection is opened for each request
+	'''
+	def __init__(self, path):
+		'''
+		Init L{SpecClient}
+		@param path: path to the Unix socket of the server
+		@type path: string
+		@return: None
+		@rtype: None
+		'''
+		self.path = path
+
+	def request(self, request):
+		'''
+		Send a request and wait for a response
+		@param request: request to be sent
+		@type request: dict
+		@return: response of the server
+		@rtype: dict
+		'''
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			sock.connect(self.path)
+			sock.sendall(json.dumps(request) + '\n')
+			rfile = sock.makefile('r')
+			line = rfile.readline()
+			rfile.close()
+		finally:
+			sock.close()
+
+		if not line:
+			raise socket.error(errno.ECONNRESET, "Connection closed by server")
+		return encode_strings(json.loads(line))
+
+	def close(self):
+		'''
+		Close the client, connections are closed after each request so there
+		is nothing to be closed
+		@return: None
+		@rtype: None
+		'''
+		pass
@@ -25,11 +25,17 @@ A spec token abstraction
 @license: GPL 2.0
 '''
 from specError import SpecBadIndex
+from specTokenKind import SpecTokenKind
 
-class SpecToken:
+class SpecToken(object):
 	'''
-	Token abstraction
+	Token abstraction, a token does not hold its own strings, it refers to a
+	part of a shared source buffer
+	@note: tokens created by L{create} or modified by setters refer to their own
+	small buffer
 	'''
+	__slots__ = [ 'source', 'start', 'prepend_len', 'token_len', 'append_len', 'line', 'kind' ]
+
 	def __init__(self, specFile = None):
 		'''
 		Init L{SpecToken}
@@ -48,16 +54,21 @@ class SpecToken:
 					break
 			return ret
 
-		self.prepend = "" # prepended whitespaces
-		self.append = ""  # appended whitespaces
-		self.token = ""
+		self.source = ""
+		self.start = 0
+		self.prepend_len = 0
+		self.token_len = 0
+		self.append_len = 0
 		self.line  = None
-		self.eol_count_prepend = 0
-		self.eol_count_append = 0
+		self.kind = None
 
 		if specFile is None:
 			return
 
+		prepend = "" # prepended whitespaces
+		append = ""  # appended whitespaces
+		token = ""
+		start = specFile.pointer
 		token_parsed = False
 
 		while True:
@@ -68,50 +79,172 @@ class SpecToken:
 					specFile.ungetc()
 					break
 				else:
-					self.token = None
+					token = None
 					break
 			elif c == ' ' or c == '\t' or c == '\n':
 				if token_parsed:
-					self.append += c
+					append += c
 				else:
-					self.prepend += c
-
-				if c == '\n' and not token_parsed:
-					self.eol_count_prepend += 1
-				elif c == '\n' and token_parsed:
-					self.eol_count_append += 1
+					prepend += c
 			elif c == '\\' and specFile.touch() == '\n':
 				if token_parsed:
-					self.append += c
-					self.append += specFile.getc()
-				else:
-					self.prepend += c
-					self.prepend += specFile.getc()
-
-				if not token_parsed:
-					self.eol_count_prepend += 1
+					append += c
+					append += specFile.getc()
 				else:
-					self.eol_count_append += 1
+					prepend += c
+					prepend += specFile.getc()
 			elif c == '#':
 				if token_parsed:
 					# TODO: make better decision, e.g. '^  #comment$'
-					if len(self.append) > 0 and self.append[-1] == '\n':
+					if len(append) > 0 and append[-1] == '\n':
 						specFile.ungetc()
 						break
 					else:
-						self.append += c
-						self.append += read_comment(specFile)
+						append += c
+						append += read_comment(specFile)
 				else:
-					self.prepend += c
-					self.prepend += read_comment(specFile)
+					prepend += c
+					prepend += read_comment(specFile)
 			else:
-				if len(self.append) == 0:
-					self.token += c
+				if len(append) == 0:
+					token += c
 					token_parsed = True
 				else:
 					specFile.ungetc()
 					break
 
+		# token is a contiguous part of the file, refer to it
+		self.source = specFile.content
+		self.start = start
+		self.prepend_len = len(prepend)
+		self.token_len = len(token) if token is not None else -1
+		self.append_len = len(append)
+
+	@staticmethod
+	def create_from_source(source, start, prepend_len, token_len, append_len, line = None, kind = None):
+		'''
+		Create a token referring to a part of a source buffer
+		@param source: source buffer
+		@type source: string
+		@param start: offset of the token (including prepend part) in source
+		@type start: number
+		@param prepend_len: length of the prepend part
+		@type prepend_len: number
+		@param token_len: length of the token itself, -1 for EOF token
+		@type token_len: number
+		@param append_len: length of the append part
+		@type append_len: number
+		@param line: line number of the token
+		@type line: number
+		@param kind: kind of the token, computed on demand if None
+		@type kind: number
+		@return: newly instantiated token
+		@rtype: L{SpecToken}
+		'''
+		ret = SpecToken()
+		ret.source = source
+		ret.start = start
+		ret.prepend_len = prepend_len
+		ret.token_len = token_len
+		ret.append_len = append_len
+		ret.line = line
+		ret.kind = kind
+		return ret
+
+	def __reduce__(self):
+		'''
+		Pickle only parts of the token, not the whole source buffer it refers
+		to, a token is always restored as a plain L{SpecToken}
+		@return: class, its arguments and state to recreate the token
+		@rtype: tuple
+		'''
+		return (SpecToken, (), (self.get_prepend(), self.get_token(), self.get_append(),
+					self.line, self.kind))
+
+	def __setstate__(self, state):
+		'''
+		Restore a pickled token, see L{__reduce__}
+		@param state: prepend, token, append, line and kind of the token
+		@type state: tuple
+		@return: None
+		@rtype: None
+		'''
+		prepend, token, append, line, kind = state
+		self.set_parts(prepend, token, append)
+		self.line = line
+		self.kind = kind
+
+	def get_prepend(self):
+		'''
+		Get prepend part of the token
+		@return: prepended whitespaces and comments
+		@rtype: string
+		'''
+		return self.source[self.start:self.start + self.prepend_len]
+
+	def get_token(self):
+		'''
+		Get token itself
+		@return: token or None if token is EOF token
+		@rtype: string
+		'''
+		if self.token_len < 0:
+			return None
+		start = self.start + self.prepend_len
+		return self.source[start:start + self.token_len]
+
+	def get_append(self):
+		'''
+		Get append part of the token
+		@return: appended whitespaces and comments
+		@rtype: string
+		'''
+		start = self.start + self.prepend_len + max(self.token_len, 0)
+		return self.source[start:start + self.append_len]
+
+	def set_parts(self, prepend, token, append):
+		'''
+		Set all parts of the token, token will refer to its own buffer
+		@param prepend: a string to be prepended
+		@type prepend: string
+		@param token: token itself or None for EOF token
+		@type token: string
+		@param append: a string to be appended
+		@type append: string
+		@return: None
+		@rtype: None
+		'''
+		self.source = prepend + (token or "") + append
+		self.start = 0
+		self.prepend_len = len(prepend)
+		self.token_len = len(token) if token is not None else -1
+		self.append_len = len(append)
+		self.kind = None
+
+	def get_kind(self):
+		'''
+		Get kind of the token
+		@return: token kind code
+		@rtype: L{SpecTokenKind} code
+		'''
+		if self.kind is None:
+			self.kind = SpecTokenKind.classify(self.get_token())
+		return self.kind
+
+	@property
+	def eol_count_prepend(self):
+		'''
+		Number of new lines in the prepend part
+		'''
+		return self.get_prepend().count('\n')
+
+	@property
+	def eol_count_append(self):
+		'''
+		Number of new lines in the append part
+		'''
+		return self.get_append().count('\n')
+
 	def __str__(self):
 		'''
 		Get raw string representation
@@ -141,14 +274,11 @@ class SpecToken:
 		@return: None
 		@rtype: None
 		'''
-		if not raw:
-			f.write(self.prepend)
-
-		if self.token is not None:
-			f.write(self.token)
-
-		if not raw:
-			f.write(self.append)
+		if raw:
+			if self.token_len > 0:
+				f.write(self.get_token())
+		else:
+			f.write(self.string())
 
 	def string(self, raw = False):
 		'''
@@ -158,14 +288,11 @@ class SpecToken:
 		@return: string representation of a token
 		@rtype: string
 		'''
-		ret = ""
-		if not raw:
-			ret += self.prepend
-		if self.token is not None:
-			ret += self.token
-		if not raw:
-			ret +=  self.append
-		return ret
+		if raw:
+			return self.get_token() or ""
+
+		return self.source[self.start:self.start + self.prepend_len \
+								+ max(self.token_len, 0) + self.append_len]
 
 	def same_line(self, token):
 		'''
@@ -175,7 +302,26 @@ class SpecToken:
 		@return: True if token is on the same line
 		@rtype: Boolean
 		'''
-		return (self.line + self.append.count('\\\n')) == token.line
+		return (self.line + self.get_append().count('\\\n')) == token.line
+
+	def get_position(self):
+		'''
+		Get position of the token in the parsed file
+		@return: line and column of the token, column is None if not known
+		@rtype: tuple (number, number)
+		'''
+		return (self.line, None)
+
+	def get_position_str(self):
+		'''
+		Get human readable position of the token, used in messages
+		@return: position of the token, e.g. "line 3, column 8"
+		@rtype: string
+		'''
+		line, column = self.get_position()
+		if column is None:
+			return "line %s" % str(line)
+		return "line %d, column %d" % (line, column)
 
 	@staticmethod
 	def create(token, prepend = '', append = ' '):
@@ -192,9 +338,7 @@ class SpecToken:
 		'''
 		# note that line is not set
 		ret = SpecToken()
-		ret.prepend = prepend
-		ret.token = token
-		ret.append = append
+		ret.set_parts(prepend, token, append)
 		return ret
 
 	def is_eof(self):
@@ -203,7 +347,7 @@ class SpecToken:
 		@return: True if token is EOF token
 		@rtype: Boolean
 		'''
-		return self.token == None
+		return self.token_len < 0
 
 	def get_line(self):
 		'''
@@ -221,7 +365,7 @@ class SpecToken:
 		@return: None
 		@rtype: None
 		'''
-		self.append = append
+		self.set_parts(self.get_prepend(), self.get_token(), append)
 
 	def set_prepend(self, prepend):
 		'''
@@ -231,7 +375,7 @@ class SpecToken:
 		@return: None
 		@rtype: None
 		'''
-		self.prepend = prepend
+		self.set_parts(prepend, self.get_token(), self.get_append())
 
 	def set_token(self, token):
 		'''
@@ -241,5 +385,8 @@ class SpecToken:
 		@return: None
 		@rtype: None
 		'''
-		self.token = token
+		self.set_parts(self.get_prepend(), token, self.get_append())
 
+	prepend = property(get_prepend, set_prepend)
+	token = property(get_token, set_token)
+	append = property(get_append, set_append)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# ####################################################################
+# specker-lib - spec file manipulation library
+# Copyright (C) 2015  Fridolin Pokorny, fpokorny@redhat.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ####################################################################
+'''
+Token kinds assigned to tokens when lexing
+@author: Fridolin Pokorny
+@contact: fpokorny@redhat.com
+@organization: Red Hat Inc.
+@license: GPL 2.0
+'''
+
+import re
+from specError import SpecNotImplemented
+from specSection import *
+
+class SpecTokenKind(object):
+	'''
+	Token kind codes, a kind is derived from a token string only so it can be
+	computed once by a tokenizer
+	@cvar EOF: end of file token
+	@cvar WORD: a plain word, not matching any other kind
+	@cvar SECTION: section header, e.g. '%build'
+	@cvar DEFINITION: definition tag, e.g. 'Requires(post):'
+	@cvar CONDITIONAL: conditional, e.g. '%if' or '%endif'
+	@cvar OPERATOR: operator used in conditions, e.g. '>='
+	@cvar MACRO: macro reference or other '%' directive, e.g. '%{name}' or '%global'
+	'''
+	EOF = 0
+	WORD = 1
+	SECTION = 2
+	DEFINITION = 3
+	CONDITIONAL = 4
+	OPERATOR = 5
+	MACRO = 6
+
+	KINDS = {}
+
+	for t in [ '>=', '<=', '<', '>', '!=', '==', '&&', '||', '!' ]:
+		KINDS[t] = OPERATOR
+
+	for t in [ '%if', '%ifarch', '%ifnarch', '%ifos', '%ifnos', '%elif', '%elifarch',
+			'%elifos', '%else', '%endif' ]:
+		KINDS[t] = CONDITIONAL
+
+	for t in [ SpecStBuild, SpecStChangelog, SpecStCheck, SpecStClean, SpecStDescription,
+			SpecStFiles, SpecStInstall, SpecStPackage, SpecStPrep, SpecStPre, SpecStPost,
+			SpecStPreun, SpecStPostun, SpecStPretrans, SpecStPosttrans, SpecStTrigger,
+			SpecStTriggerin, SpecStTriggerprein, SpecStTriggerun, SpecStTriggerpostun,
+			SpecStVerifyscript ]:
+		KINDS[str(t)] = SECTION
+
+	del t
+
+	# a tag optionally prefixed by conditional macros, value can follow colon
+	DEFINITION_RE = re.compile(r'(?:%\{\?[^}]*\})*[A-Za-z][^:]*:')
+
+	def __init__(self):
+		'''
+		Init
+		@return: None
+		@rtype: None
+		@raise SpecNotImplemented: always, kinds should not be instantiated
+		'''
+		raise SpecNotImplemented("Cannot instantiate")
+
+	@staticmethod
+	def classify(token):
+		'''
+		Get kind of a token
+		@param token: token string, None for EOF token
+		@type token: string
+		@return: kind code
+		@rtype: number
+		'''
+		if token is None:
+			return SpecTokenKind.EOF
+
+		ret = SpecTokenKind.KINDS.get(token)
+		if ret is not None:
+			return ret
+
+		if SpecTokenKind.DEFINITION_RE.match(token):
+			return SpecTokenKind.DEFINITION
+
+		if token[0] == '%':
+			return SpecTokenKind.MACRO
+
+		return SpecTokenKind.WORD
+
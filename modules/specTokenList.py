@@ -27,40 +27,146 @@ A spec token list
 import cStringIO
 from specError import SpecBadIndex
 from specFile import SpecFile
-from specToken import SpecToken
+from specTokenizer import SpecRegexTokenizer
+from specTokenStore import SpecTokenStore
 
-class SpecTokenList:
+class SpecTokenList(object):
 	'''
 	List of token abstraction with a working pointer
+	@cvar TOKENIZER: default tokenizer backend
+	@note: a token list either holds tokens in a list or refers to a range of
+	tokens in a L{SpecTokenStore} (columnar mode); a columnar list is turned
+	into a plain list once it is modified
+	@note: a lazy token list lexes tokens only as far as they are requested,
+	asking for its length lexes the whole input
 	'''
-	def __init__(self, spec = None):
+	TOKENIZER = SpecRegexTokenizer
+
+	def __init__(self, spec = None, tokenizer = None, columnar = True, lazy = True):
 		'''
 		Init L{SpecTokenList}
-		@param spec: file or string to be parsed
-		@type spec: string/file
+		@param spec: file, string or L{SpecFile} to be parsed
+		@type spec: string/file/L{SpecFile}
+		@param tokenizer: tokenizer backend to be used, L{TOKENIZER} if None
+		@type tokenizer: L{SpecTokenizer}
+		@param columnar: if True, parsed tokens are kept in a L{SpecTokenStore}
+		@type columnar: Boolean
+		@param lazy: if True, tokens are lexed on demand (columnar mode only)
+		@type lazy: Boolean
 		@return: None
 		@rtype: None
 		'''
 		self.current = 0
 		self.pointer = 0
-		self.token_list = []
+		self.tokens = []
+		self.store = None
+		self.begin = 0
+		self.end = 0
 
 		# TODO: pass spec in another method
 		if spec is None:
 			return
 
-		line = 1
-		specFile = SpecFile(spec)
-		while True:
-			t = SpecToken(specFile)
-			self.token_list.append(t)
+		if tokenizer is None:
+			tokenizer = self.TOKENIZER
 
-			line += t.eol_count_prepend
-			t.line = line
-			line += t.eol_count_append
+		specFile = spec if isinstance(spec, SpecFile) else SpecFile(spec)
+		if columnar:
+			self.store = SpecTokenStore(specFile, tokenizer.spans(specFile))
+			if lazy:
+				self.end = None # up to the end of the store
+			else:
+				self.end = self.store.fill()
+		else:
+			self.tokens = list(tokenizer.tokenize(specFile))
+
+	@staticmethod
+	def create_range(store, begin, end):
+		'''
+		Create a token list referring to a range of tokens in a store
+		@param store: store holding tokens
+		@type store: L{SpecTokenStore}
+		@param begin: index of the first token
+		@type begin: number
+		@param end: index after the last token, None for the end of the store
+		@type end: number
+		@return: token list, no tokens are copied
+		@rtype: L{SpecTokenList}
+		'''
+		ret = SpecTokenList()
+		ret.store = store
+		ret.begin = begin
+		ret.end = end
+		return ret
 
-			if t.token == None:
-				break
+	def get_token_list(self):
+		'''
+		Get tokens as a list
+		@return: list of tokens, a copy for a columnar token list so it is
+		not modified by modifying the returned list, see L{get_mutable_tokens}
+		@rtype: list of L{SpecToken}
+		'''
+		if self.store is not None:
+			return [ self.store.get(i) for i in xrange(self.begin, self.begin + len(self)) ]
+		return self.tokens
+
+	def get_mutable_tokens(self):
+		'''
+		Get tokens as a list to be modified in place, columnar token list is
+		turned into a plain list and its tokens are marked as modified in the
+		store
+		@return: list of tokens
+		@rtype: list of L{SpecToken}
+		'''
+		if self.store is not None:
+			self.set_token_list(self.get_token_list())
+		return self.tokens
+
+	def set_token_list(self, tokens):
+		'''
+		Set list of tokens
+		@param tokens: tokens to be used
+		@type tokens: list of L{SpecToken}
+		@return: None
+		@rtype: None
+		'''
+		if self.store is not None:
+			self.store.set_modified(self.begin, self.begin + len(self))
+		self.tokens = tokens
+		self.store = None
+
+	token_list = property(get_token_list, set_token_list)
+
+	def __getstate__(self):
+		'''
+		Get state to be pickled, a columnar token list is pickled as a plain
+		list so the store and its source buffer are not pickled
+		@return: token list state
+		@rtype: dict
+		'''
+		ret = self.__dict__.copy()
+		if self.store is not None:
+			ret['tokens'] = [ self.store.get(i) for i in xrange(self.begin, self.begin + len(self)) ]
+			ret['store'] = None
+			ret['begin'] = 0
+			ret['end'] = 0
+		return ret
+
+	def in_list(self, i):
+		'''
+		Check if an index is within the list, lex tokens up to the index if needed
+		@param i: index to token list
+		@type i: number
+		@return: True if there is a token on the index
+		@rtype: Boolean
+		'''
+		store = self.store
+		if store is None:
+			return i < len(self.tokens)
+		if self.end is None:
+			i += self.begin
+			return i < len(store.starts) or store.has(i)
+		return i < self.end - self.begin
 
 	def is_eof(self):
 		'''
@@ -68,7 +174,7 @@ class SpecTokenList:
 		@return: True if pointer points at the end of file
 		@rtype: Boolean
 		'''
-		return self.pointer == len(self.token_list)
+		return not self.in_list(self.pointer)
 
 	def next(self):
 		'''
@@ -77,11 +183,11 @@ class SpecTokenList:
 		@rtype: L{SpecToken}
 		@raise StopIteration: when end of token list is reached
 		'''
-		if self.current == len(self.token_list):
+		if not self.in_list(self.current):
 			raise StopIteration
 		else:
 			self.current += 1
-			return self.token_list[self.current - 1]
+			return self.get_item(self.current - 1)
 
 	def get(self):
 		'''
@@ -89,10 +195,10 @@ class SpecTokenList:
 		@return: next token
 		@rtype: L{SpecToken}
 		'''
-		if self.pointer == len(self.token_list):
-			return self.token_list[-1] # eof
+		if not self.in_list(self.pointer):
+			return self[-1] # eof
 		self.pointer += 1
-		return self.token_list[self.pointer - 1]
+		return self.get_item(self.pointer - 1)
 
 	def touch(self):
 		'''
@@ -101,10 +207,21 @@ class SpecTokenList:
 		@rtype: L{SpecToken}
 		@raise SpecNotFound:
 		'''
-		if self.pointer == len(self.token_list):
-			return self.token_list[-1] # eof
+		if not self.in_list(self.pointer):
+			return self[-1] # eof
+
+		return self.get_item(self.pointer)
+
+	def touch_kind(self):
+		'''
+		Get kind of the next token and B{DO NOT} advance pointer
+		@return: kind of the next token
+		@rtype: L{SpecTokenKind} code
+		'''
+		if self.store is not None and self.in_list(self.pointer):
+			return self.store.get_kind(self.begin + self.pointer)
 
-		return self.token_list[self.pointer]
+		return self.touch().get_kind()
 
 	def get_line(self):
 		'''
@@ -112,6 +229,24 @@ class SpecTokenList:
 		@return: list of tokens on the same line
 		@rtype: L{SpecTokenList}
 		'''
+		if self.store is not None:
+			store = self.store
+			i = self.pointer
+
+			if self.in_list(i):
+				i += 1
+				while self.in_list(i):
+					idx = self.begin + i
+					if store.get_line(idx) != store.get_line(idx - 1):
+						# check for escaped \n
+						if not store.is_continued(idx - 1):
+							break
+					i += 1
+
+			ret = SpecTokenList.create_range(store, self.begin + self.pointer, self.begin + i)
+			self.pointer = i
+			return ret
+
 		ret = []
 
 		while not self.is_eof():
@@ -141,6 +276,16 @@ class SpecTokenList:
 		@return: list of tokens until predicate was not True
 		@rtype: L{SpecTokenList}
 		'''
+		if self.store is not None:
+			begin = self.begin + self.pointer
+
+			while not self.touch().is_eof():
+				if callback(self):
+					break
+				self.get()
+
+			return SpecTokenList.create_range(self.store, begin, self.begin + self.pointer)
+
 		ret = []
 
 		while not self.touch().is_eof():
@@ -153,6 +298,19 @@ class SpecTokenList:
 		l.token_list = ret
 		return l
 
+	def get_remaining(self):
+		'''
+		Get tokens from the pointer up to the end, B{DO NOT} advance pointer
+		@return: remaining tokens, they are not lexed until requested
+		@rtype: L{SpecTokenList}
+		'''
+		if self.store is not None:
+			return SpecTokenList.create_range(self.store, self.begin + self.pointer, self.end)
+
+		l = SpecTokenList()
+		l.token_list = self.tokens[self.pointer:]
+		return l
+
 	def unget(self):
 		'''
 		Move the buffer pointer one step back
@@ -179,7 +337,7 @@ class SpecTokenList:
 		@type val: number
 		@raise SpecBadIndex: when a pointer reaches boundaries
 		'''
-		if val < 0 or val > len(self.token_list):
+		if val < 0 or (val > 0 and not self.in_list(val - 1)):
 			raise SpecBadIndex('TokenList pointer out of bound')
 		self.pointer = val
 
@@ -189,7 +347,11 @@ class SpecTokenList:
 		@return: length of the list
 		@rtype: number
 		'''
-		return len(self.token_list)
+		if self.store is None:
+			return len(self.tokens)
+		if self.end is None:
+			return self.store.fill() - self.begin
+		return self.end - self.begin
 
 	def __iter__(self):
 		'''
@@ -218,9 +380,32 @@ class SpecTokenList:
 		@return: None
 		@rtype: None
 		'''
-		for token in self.token_list:
+		if self.store is not None:
+			self.store.write(f, self.begin, self.begin + len(self), raw)
+			return
+
+		for token in self.tokens:
 			token.write(f, raw)
 
+	def get_span(self, begin, end):
+		'''
+		Get location of a range of tokens in the parsed source buffer
+		@param begin: index of the first token
+		@type begin: number
+		@param end: index after the last token
+		@type end: number
+		@return: token store, start and end offset in its source buffer or
+		None if tokens are not kept in a store or were modified
+		@rtype: tuple (L{SpecTokenStore}, number, number)
+		'''
+		if self.store is None:
+			return None
+
+		offsets = self.store.get_offsets(self.begin + begin, self.begin + end)
+		if offsets is None:
+			return None
+		return (self.store, offsets[0], offsets[1])
+
 	def get_raw(self):
 		'''
 		Get string representation of token list
@@ -233,6 +418,14 @@ class SpecTokenList:
 		output.close()
 		return ret
 
+	def __str__(self):
+		'''
+		Get tokens separated by a single space, without comments
+		@return: string representation of token list
+		@rtype: string
+		'''
+		return ' '.join(self[i].string(True) for i in xrange(len(self)))
+
 	def token_list_append(self, item):
 		'''
 		Append item to the token list
@@ -241,7 +434,7 @@ class SpecTokenList:
 		@return: None
 		@rtype: None
 		'''
-		self.token_list.append(item)
+		self.get_mutable_tokens().append(item)
 
 	def token_list_append_items(self, items):
 		'''
@@ -251,8 +444,21 @@ class SpecTokenList:
 		@return: None
 		@rtype: None
 		'''
+		tokens = self.get_mutable_tokens()
 		for item in items:
-			self.token_list.append(item)
+			tokens.append(item)
+
+	def get_item(self, i):
+		'''
+		Get item on an index which is known to be in the list, see L{in_list}
+		@param i: index to token list, not negative
+		@type i: number
+		@return: token on given position
+		@rtype: L{SpecToken}
+		'''
+		if self.store is not None:
+			return self.store.get(self.begin + i)
+		return self.tokens[i]
 
 	def __getitem__(self, i):
 		'''
@@ -262,7 +468,14 @@ class SpecTokenList:
 		@return: token on given position
 		@rtype: L{SpecToken}
 		'''
-		return self.token_list[i]
+		if self.store is not None:
+			if i < 0:
+				i += len(self)
+			if i < 0 or not self.in_list(i):
+				raise SpecBadIndex('TokenList index out of bound')
+			return self.store.get(self.begin + i)
+
+		return self.tokens[i]
 
 	def __setitem__(self, i, item):
 		'''
@@ -274,7 +487,7 @@ class SpecTokenList:
 		@return: token on given position
 		@rtype: L{SpecToken}
 		'''
-		self.token_list[i] = item
+		self.get_mutable_tokens()[i] = item
 
 	def __eq__(self, str_compare):
 		'''
@@ -284,8 +497,5 @@ class SpecTokenList:
 		@return: True if string is same as value of tokens in token list
 		@rtype: None
 		'''
-		str_created = ""
-		for token in self.token_list:
-			str_created += token.string(raw = True)
-		return str_created == str_compare
+		return self.get_raw() == str_compare
 
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+# ####################################################################
+# specker-lib - spec file manipulation library
+# Copyright (C) 2015  Fridolin Pokorny, fpokorny@redhat.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ####################################################################
+'''
+Columnar token storage
+@author: Fridolin Pokorny
+@contact: fpokorny@redhat.com
+@organization: Red Hat Inc.
+@license: GPL 2.0
+'''
+
+from array import array
+from specToken import SpecToken
+
+class SpecStoreToken(SpecToken):
+	'''
+	A token created on demand from L{SpecTokenStore} columns
+	@note: once modified, the token is pinned in the store so the change is
+	not lost when the token is requested again
+	'''
+	__slots__ = [ 'store', 'index' ]
+
+	def same_line(self, token):
+		'''
+		Check if (next) token is on the same line as myself
+		@param token: token to be checked
+		@type token: L{SpecToken}
+		@return: True if token is on the same line
+		@rtype: Boolean
+		'''
+		if self.source is not self.store.source:
+			return SpecToken.same_line(self, token) # modified token
+
+		start = self.start + self.prepend_len + max(self.token_len, 0)
+		return self.line + self.store.specFile.count_continuations(start, start + self.append_len) \
+					== token.line
+
+	def get_position(self):
+		'''
+		Get position of the token in the parsed file
+		@return: line and column of the token, column is None if not known
+		@rtype: tuple (number, number)
+		'''
+		if self.source is not self.store.source:
+			return SpecToken.get_position(self) # modified token
+
+		return self.store.specFile.get_position(self.start + self.prepend_len)
+
+	def set_parts(self, prepend, token, append):
+		'''
+		Set all parts of the token and pin the token in its store
+		@param prepend: a string to be prepended
+		@type prepend: string
+		@param token: token itself or None for EOF token
+		@type token: string
+		@param append: a string to be appended
+		@type append: string
+		@return: None
+		@rtype: None
+		'''
+		SpecToken.set_parts(self, prepend, token, append)
+		if self.index not in self.store.pinned:
+			self.store.set_modified(self.index, self.index + 1)
+		self.store.pinned[self.index] = self
+
+class SpecTokenStore(object):
+	'''
+	Tokens of a source buffer stored in columns (start offset, prepend, token
+	and append length, line, kind), tokens are instantiated only when requested
+	@note: if a producer is set, tokens are lexed only as far as they are
+	requested, see L{has}
+	'''
+	def __init__(self, specFile, producer = None):
+		'''
+		Init L{SpecTokenStore}
+		@param specFile: spec file tokens refer to
+		@type specFile: L{SpecFile}
+		@param producer: token spans to be lazily appended to the store, see
+		L{SpecTokenizer.spans}
+		@type producer: generator of tuples
+		@return: None
+		@rtype: None
+		'''
+		self.specFile = specFile
+		self.source = specFile.content
+		self.producer = producer
+		self.starts = array('l')
+		self.prepend_lens = array('i')
+		self.token_lens = array('i')
+		self.append_lens = array('i')
+		self.lines = array('i')
+		self.kinds = array('b')
+		self.pinned = {}
+		self.modified = []
+		self.last_index = None
+		self.last_token = None
+
+	def append(self, start, prepend_len, token_len, append_len, line, kind):
+		'''
+		Append a token
+		@param start: offset of the token (including prepend part) in source
+		@type start: number
+		@param prepend_len: length of the prepend part
+		@type prepend_len: number
+		@param token_len: length of the token itself, -1 for EOF token
+		@type token_len: number
+		@param append_len: length of the append part
+		@type append_len: number
+		@param line: line number of the token
+		@type line: number
+		@param kind: kind of the token
+		@type kind: L{SpecTokenKind} code
+		@return: None
+		@rtype: None
+		'''
+		self.starts.append(start)
+		self.prepend_lens.append(prepend_len)
+		self.token_lens.append(token_len)
+		self.append_lens.append(append_len)
+		self.lines.append(line)
+		self.kinds.append(kind)
+
+	def __len__(self):
+		'''
+		Number of stored tokens, tokens which were not lexed yet are not counted
+		@return: number of tokens
+		@rtype: number
+		'''
+		return len(self.starts)
+
+	def has(self, idx):
+		'''
+		Check whether there is a token on the given index, lex tokens up to the
+		index if needed
+		@param idx: token index
+		@type idx: number
+		@return: True if there is a token on the given index
+		@rtype: Boolean
+		'''
+		if idx < len(self.starts):
+			return True
+
+		if self.producer is not None:
+			append = self.append
+			for span in self.producer:
+				append(*span)
+				if idx < len(self.starts):
+					return True
+			self.producer = None
+
+		return False
+
+	def fill(self):
+		'''
+		Lex all remaining tokens
+		@return: number of tokens
+		@rtype: number
+		'''
+		if self.producer is not None:
+			append = self.append
+			for span in self.producer:
+				append(*span)
+			self.producer = None
+
+		return len(self.starts)
+
+	def get(self, idx):
+		'''
+		Get token on the given index
+		@param idx: token index
+		@type idx: number
+		@return: token
+		@rtype: L{SpecToken}
+		'''
+		if idx == self.last_index:
+			return self.last_token
+
+		ret = self.pinned.get(idx)
+		if ret is None:
+			ret = SpecStoreToken()
+			ret.source = self.source
+			ret.start = self.starts[idx]
+			ret.prepend_len = self.prepend_lens[idx]
+			ret.token_len = self.token_lens[idx]
+			ret.append_len = self.append_lens[idx]
+			ret.line = self.lines[idx]
+			ret.kind = self.kinds[idx]
+			ret.store = self
+			ret.index = idx
+
+		self.last_index = idx
+		self.last_token = ret
+		return ret
+
+	def get_line(self, idx):
+		'''
+		Get line of a token
+		@param idx: token index
+		@type idx: number
+		@return: line number
+		@rtype: number
+		'''
+		if idx in self.pinned:
+			return self.pinned[idx].line
+		return self.lines[idx]
+
+	def get_kind(self, idx):
+		'''
+		Get kind of a token without instantiating it
+		@param idx: token index
+		@type idx: number
+		@return: token kind code
+		@rtype: L{SpecTokenKind} code
+		'''
+		if idx in self.pinned:
+			return self.pinned[idx].get_kind()
+		return self.kinds[idx]
+
+	def get_string(self, idx, raw = False):
+		'''
+		Get string representation of a token without instantiating it
+		@param idx: token index
+		@type idx: number
+		@param raw: if True, only token itself without append and prepend part
+		@type raw: Boolean
+		@return: string representation of a token
+		@rtype: string
+		'''
+		if idx in self.pinned:
+			return self.pinned[idx].string(raw)
+
+		start = self.starts[idx]
+		if raw:
+			start += self.prepend_lens[idx]
+			return self.source[start:start + max(self.token_lens[idx], 0)]
+
+		return self.source[start:start + self.prepend_lens[idx] \
+								+ max(self.token_lens[idx], 0) + self.append_lens[idx]]
+
+	def is_continued(self, idx):
+		'''
+		Check whether a token is followed by an escaped new line
+		@param idx: token index
+		@type idx: number
+		@return: True if append part of the token ends with '\\\\\\n'
+		@rtype: Boolean
+		'''
+		if idx in self.pinned:
+			return self.pinned[idx].append[-2:] == "\\\n"
+
+		end = self.starts[idx] + self.prepend_lens[idx] + max(self.token_lens[idx], 0) \
+				+ self.append_lens[idx]
+		return self.append_lens[idx] >= 2 and self.source[end - 2:end] == "\\\n"
+
+	def set_modified(self, begin, end):
+		'''
+		Mark a range of tokens as modified, source text containing them is
+		no longer valid, see L{is_modified}
+		@param begin: index of the first token
+		@type begin: number
+		@param end: index after the last token, same as begin for a position
+		between tokens
+		@type end: number
+		@return: None
+		@rtype: None
+		'''
+		if begin < end:
+			self.modified.append((self.starts[begin], self.starts[end - 1] + self.prepend_lens[end - 1] \
+						+ max(self.token_lens[end - 1], 0) + self.append_lens[end - 1]))
+		elif self.has(begin):
+			self.modified.append((self.starts[begin], self.starts[begin]))
+		else:
+			self.modified.append((len(self.source), len(self.source)))
+
+	def is_modified(self, start, end):
+		'''
+		Check whether a token within a part of the source buffer was modified
+		@param start: start offset in source
+		@type start: number
+		@param end: end offset in source
+		@type end: number
+		@return: True if a token within the part or a token list ending or
+		beginning on its boundary was modified
+		@rtype: Boolean
+		'''
+		for mod_start, mod_end in self.modified:
+			if mod_start < end and mod_end > start:
+				return True
+			if mod_start == mod_end and start <= mod_start <= end:
+				return True
+		return False
+
+	def get_offsets(self, begin, end):
+		'''
+		Get location of a range of tokens in the source buffer
+		@param begin: index of the first token
+		@type begin: number
+		@param end: index after the last token
+		@type end: number
+		@return: start and end offset in source or None if the range is empty
+		or a token in the range was modified
+		@rtype: tuple (number, number)
+		'''
+		if begin >= end or [ i for i in self.pinned if begin <= i < end ]:
+			return None
+
+		# tokens in a range are contiguous in the source buffer
+		return (self.starts[begin], self.starts[end - 1] + self.prepend_lens[end - 1] \
+					+ max(self.token_lens[end - 1], 0) + self.append_lens[end - 1])
+
+	def write(self, f, begin, end, raw = False):
+		'''
+		Write a range of tokens to a file
+		@param f: file to write tokens to
+		@type f: FILE
+		@param begin: index of the first token
+		@type begin: number
+		@param end: index after the last token
+		@type end: number
+		@param raw: if True, tokens are written without append and prepend part
+		@type raw: Boolean
+		@return: None
+		@rtype: None
+		'''
+		if begin >= end:
+			return
+
+		offsets = self.get_offsets(begin, end) if not raw else None
+		if offsets is not None:
+			f.write(self.source[offsets[0]:offsets[1]])
+			return
+
+		for idx in xrange(begin, end):
+			f.write(self.get_string(idx, raw))
+
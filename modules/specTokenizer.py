@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# ####################################################################
+# specker-lib - spec file manipulation library
+# Copyright (C) 2015  Fridolin Pokorny, fpokorny@redhat.com
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+# ####################################################################
+'''
+Tokenizer backends used by L{SpecTokenList}
+@author: Fridolin Pokorny
+@contact: fpokorny@redhat.com
+@organization: Red Hat Inc.
+@license: GPL 2.0
+'''
+
+import re
+from bisect import bisect_left
+from specError import SpecNotImplemented
+from specToken import SpecToken
+from specTokenKind import SpecTokenKind
+
+class SpecTokenizer(object):
+	'''
+	A generic tokenizer - splits a L{SpecFile} into L{SpecToken}s
+	'''
+	def __init__(self):
+		'''
+		Init
+		@return: None
+		@rtype: None
+		@raise SpecNotImplemented: always, tokenizer should not be instantiated
+		'''
+		raise SpecNotImplemented("Cannot instantiate")
+
+	@classmethod
+	def spans(cls, specFile):
+		'''
+		Tokenize a spec file without instantiating tokens
+		@param specFile: a spec file to be tokenized
+		@type specFile: L{SpecFile}
+		@return: token spans in a form (start, prepend length, token length,
+		append length, line, kind), the last one is EOF token with token length -1
+		@rtype: generator of tuples
+		@raise SpecNotImplemented: if tokenizer is not implemented
+		'''
+		raise SpecNotImplemented("Tokenizer not implemented")
+
+	@classmethod
+	def tokenize(cls, specFile):
+		'''
+		Tokenize a spec file
+		@param specFile: a spec file to be tokenized
+		@type specFile: L{SpecFile}
+		@return: tokens with line set, the last one is EOF token
+		@rtype: generator of L{SpecToken}
+		'''
+		content = specFile.content
+		create = SpecToken.create_from_source
+		for span in cls.spans(specFile):
+			yield create(content, *span)
+
+class SpecCharTokenizer(SpecTokenizer):
+	'''
+	Character by character tokenizer, each token is read by L{SpecToken}
+	'''
+	@classmethod
+	def spans(cls, specFile):
+		'''
+		Tokenize a spec file without instantiating tokens
+		@param specFile: a spec file to be tokenized
+		@type specFile: L{SpecFile}
+		@return: token spans in a form (start, prepend length, token length,
+		append length, line, kind), the last one is EOF token with token length -1
+		@rtype: generator of tuples
+		'''
+		for t in cls.tokenize(specFile):
+			yield (t.start, t.prepend_len, t.token_len, t.append_len, t.line, t.get_kind())
+
+	@classmethod
+	def tokenize(cls, specFile):
+		'''
+		Tokenize a spec file
+		@param specFile: a spec file to be tokenized
+		@type specFile: L{SpecFile}
+		@return: tokens with line set, the last one is EOF token
+		@rtype: generator of L{SpecToken}
+		'''
+		line = 1
+		while True:
+			t = SpecToken(specFile)
+
+			line += t.eol_count_prepend
+			t.line = line
+			line += t.eol_count_append
+
+			yield t
+
+			if t.token == None:
+				break
+
+class SpecRegexTokenizer(SpecTokenizer):
+	'''
+	Tokenizer scanning the whole buffer using compiled patterns, produces the
+	same tokens as L{SpecCharTokenizer}
+	@cvar TOKEN_RE: pattern matching prepend, token and append part of a token
+	@note: unlike L{SpecCharTokenizer}, the last token is not lost when a file
+	does not end with a whitespace
+	'''
+	TOKEN_RE = re.compile(r'''
+		# whitespaces, line continuations and comments before token
+		(?P<prepend>(?:[ \t\n]+|\\\n|\#[^\n]*)*)
+		# token itself, a comment or a line continuation terminates it
+		(?P<token>(?:[^ \t\n\#\\]+|\\(?!\n))+)?
+		# whitespaces, line continuations and comments after token; a comment
+		# placed on a new line belongs to the next token
+		(?(token)(?P<append>(?:[ \t\n]+|\\\n|(?<!\n)\#[^\n]*)*))
+		''', re.VERBOSE)
+
+	@classmethod
+	def spans(cls, specFile):
+		'''
+		Tokenize a spec file without instantiating tokens
+		@param specFile: a spec file to be tokenized
+		@type specFile: L{SpecFile}
+		@return: token spans in a form (start, prepend length, token length,
+		append length, line, kind), the last one is EOF token with token length -1
+		@rtype: generator of tuples
+		'''
+		match = cls.TOKEN_RE.match
+		classify = SpecTokenKind.classify
+		content = specFile.content
+		# new lines are indexed only as far as the file is lexed
+		newlines = specFile.newlines
+		indexed = specFile.index_newlines(specFile.pointer)
+		line = 0 # number of new lines before token
+
+		while True:
+			m = match(content, specFile.pointer)
+			start = specFile.pointer
+			token_start, token_end = m.span('token')
+			end = specFile.pointer = m.end()
+
+			if token_start < 0:
+				specFile.index_newlines(end)
+				line = bisect_left(newlines, end, line)
+				yield (start, end - start, -1, 0, line + 1, SpecTokenKind.EOF)
+				break
+
+			if token_start > indexed:
+				indexed = specFile.index_newlines(token_start)
+			line = bisect_left(newlines, token_start, line)
+			yield (start, token_start - start, token_end - token_start, end - token_end, line + 1,
+					classify(content[token_start:token_end]))
@@ -0,0 +1,20 @@
+Name:           colon
+Version:        1.0
+Release:        1%{?dist}
+Summary:        A package with colons in its description
+License:        MIT
+
+%description
+This tool provides: nothing.
+More text follows, version: 1.0 is not a tag
+and neither is name: foo.
+
+%prep
+%setup -q
+
+%files
+%doc README
+
+%changelog
+* Mon Jan 05 2015 Foo Bar <foo@example.com> - 1.0-1
+- Initial package
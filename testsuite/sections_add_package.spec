@@ -0,0 +1,7 @@
+%package extra
+Summary: x
+Requires: y
+
+%description extra
+foo
+